@@ -1,14 +1,26 @@
-from flask import Flask, render_template_string, send_from_directory, jsonify
+from flask import Flask, render_template_string, send_from_directory, jsonify, request, Response
 import os
 import re
 import json
+import hashlib
+import threading
+import time
+from core.progress_log import ProgressLog
+from core.status import StatusBlock
 
 app = Flask(__name__)
 server = app
 
 IMG_FOLDER = "img"
 os.makedirs(IMG_FOLDER, exist_ok=True)
-LOG_FILE = "log.json"
+LOG_FILE = "log.jsonl"
+LOG_BACKUPS = 3          # comme LOG_BACKUPS dans s_a.py : rotations relues par read_since
+PROGRESS_LOG = ProgressLog(LOG_FILE, backups=LOG_BACKUPS)
+LOG_LINES = 12
+WATCH_INTERVAL = 0.5     # période de surveillance de log.jsonl et img/
+KEEPALIVE = 15           # commentaire SSE envoyé aux flux inactifs
+TOP_SOLUTIONS = 3
+IMG_MAX_AGE = 365 * 24 * 3600   # images immuables une fois écrites
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -120,7 +132,8 @@ body {
 </style>
 <script>
 let currentFiles = {{ current_files | safe }};
-let lastLogHash = "";
+let logEntries = [];
+let logCursor = {{ log_cursor | safe }};
 
 window.addEventListener('wheel', function(e) { e.preventDefault(); }, { passive: false });
 
@@ -144,9 +157,10 @@ function formatStepSec(val) {
 }
 
 function renderLog(entries) {
+    logEntries = logEntries.concat(entries).slice(-{{ log_lines }});
     const container = document.getElementById("log-window");
     container.innerHTML = "";
-    entries.slice(-12).forEach(entry => {
+    logEntries.forEach(entry => {
         const best_score = padRight(entry.best_score - 64, 3);
         const seed = padRight(entry.seed, 2);
         const elapsed_time = padRight(Math.floor(entry.elapsed_time), 8); // jusqu'à 100M
@@ -166,29 +180,26 @@ function renderLog(entries) {
     container.scrollTop = container.scrollHeight;
 }
 
-async function fetchUpdates() {
-    try {
-        const respImg = await fetch("/file_list");
-        const dataImg = await respImg.json();
-        const newFiles = dataImg.files;
-        const added = newFiles.filter(f => !currentFiles.includes(f));
-        if (added.length > 0 || newFiles.length !== currentFiles.length) {
+// Flux SSE : le serveur pousse les nouvelles lignes du log et les images
+// ajoutées ou supprimées, rien ne circule tant que rien ne change.
+// En cas de reconnexion, Last-Event-ID reprend le log au bon octet.
+function listenEvents() {
+    const query = logCursor ? `?inode=${logCursor[0]}&offset=${logCursor[1]}` : "";
+    const source = new EventSource("/events" + query);
+    source.addEventListener("log", e => renderLog(JSON.parse(e.data)));
+    source.addEventListener("solutions", e => {
+        const data = JSON.parse(e.data);
+        const files = data.files
+            || currentFiles.filter(f => !data.removed.includes(f)).concat(data.added);
+        const changed = files.length !== currentFiles.length
+            || files.some(f => !currentFiles.includes(f));
+        if (changed) {
             window.location.reload();
-            return;
         }
-
-        const respLog = await fetch("/log_data");
-        const dataLog = await respLog.json();
-        if (dataLog.hash !== lastLogHash) {
-            renderLog(dataLog.entries);
-            lastLogHash = dataLog.hash;
-        }
-    } catch(e) {
-        console.error(e);
-    }
+    });
 }
 
-setInterval(fetchUpdates, 1000);
+listenEvents();
 </script>
 </head>
 <body>
@@ -217,9 +228,9 @@ setInterval(fetchUpdates, 1000);
             Score: {{ sol.score }}
         </div>
         <img id="img{{ loop.index }}"
-             src="/img/{{ sol.without_marks }}"
-             data-with="/img/{{ sol.with_marks }}"
-             data-without="/img/{{ sol.without_marks }}">
+             src="/img/{{ sol.without_marks }}?v={{ sol.version }}"
+             data-with="/img/{{ sol.with_marks }}?v={{ sol.version }}"
+             data-without="/img/{{ sol.without_marks }}?v={{ sol.version }}">
     </div>
     {% endfor %}
 </div>
@@ -234,12 +245,13 @@ renderLog({{ log_entries | safe }});
 
 @app.route("/img/<path:filename>")
 def serve_image(filename):
-    return send_from_directory(IMG_FOLDER, filename)
+    # l'URL porte ?v=mtime : un nouveau rendu change d'URL
+    response = send_from_directory(IMG_FOLDER, filename, max_age=IMG_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
-def get_top_solutions(n=3):
-    if not os.path.exists(IMG_FOLDER):
-        return []
-    files = os.listdir(IMG_FOLDER)
+def scan_solutions(files):
     files_with_marks = [f for f in files if "_with_marks" in f and f.endswith(".jpg")]
     solutions = []
     pattern = r"partial_solution_(\d+)_with_marks\.jpg$"
@@ -255,52 +267,307 @@ def get_top_solutions(n=3):
                     "without_marks": without_file
                 })
     solutions.sort(key=lambda x: x["score"], reverse=True)
-    return solutions[:n]
+    return solutions
+
+def get_top_solutions(n=TOP_SOLUTIONS):
+    return index_cache.images()[2][:n]
+
+def simplify_log(entries):
+    simplified = []
+    for entry in entries:
+        simplified.append({
+            "best_score": entry.get("best_score"),
+            "seed": entry.get("seed"),
+            "elapsed_time": entry.get("elapsed_time",0),
+            "step": entry.get("step"),
+            "steps_per_sec": entry.get("steps_per_sec",0)
+        })
+    return simplified
 
 def read_log():
-    if not os.path.exists(LOG_FILE):
-        return []
+    _, entries, cursor = index_cache.log_tail()
+    return entries, cursor
+
+def read_log_since(cursor):
+    entries, cursor = PROGRESS_LOG.read_since(cursor)
+    return simplify_log(entries), cursor
+
+def stat_key(path, *fields):
     try:
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            logs = json.load(f)
-            simplified = []
-            for entry in logs:
-                simplified.append({
-                    "best_score": entry.get("best_score"),
-                    "seed": entry.get("seed"),
-                    "elapsed_time": entry.get("elapsed_time",0),
-                    "step": entry.get("step"),
-                    "steps_per_sec": entry.get("steps_per_sec",0)
-                })
-            return simplified
-    except json.JSONDecodeError:
-        return []
+        st = os.stat(path)
+    except OSError:
+        return None
+    return tuple(getattr(st, f) for f in fields)
+
+
+class DashboardIndex:
+    # Vue en mémoire de img/ et de la fin de log.jsonl. Chaque accès ne coûte
+    # que quelques stat() : img/ n'est relu que si le mtime du dossier change,
+    # le log n'est relu que depuis le dernier octet connu. Les clés servent
+    # aussi d'ETag.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.img_key = False
+        self.files = []
+        self.solutions = []
+        self.log_key = False
+        self.log_entries = []
+        self.log_cursor = None
+
+    def images(self):
+        # (clé, fichiers .jpg triés, solutions triées par score)
+        with self.lock:
+            key = stat_key(IMG_FOLDER, "st_mtime_ns")
+            if key != self.img_key:
+                self.files = sorted(f for f in os.listdir(IMG_FOLDER) if f.endswith(".jpg")) if key else []
+                self.solutions = scan_solutions(self.files)
+                self.img_key = key
+            # un rendu réécrit en place ne change pas le mtime du dossier :
+            # les images affichées sont contrôlées une à une
+            for sol in self.solutions[:TOP_SOLUTIONS]:
+                sol["version"] = (stat_key(os.path.join(IMG_FOLDER, sol["with_marks"]), "st_mtime_ns") or (0,))[0]
+            versions = tuple(sol["version"] for sol in self.solutions[:TOP_SOLUTIONS])
+            return (key, versions), self.files, self.solutions
+
+    def log_tail(self):
+        # (clé, LOG_LINES dernières entrées, curseur juste après)
+        with self.lock:
+            key = stat_key(LOG_FILE, "st_ino", "st_size", "st_mtime_ns")
+            if key != self.log_key:
+                if self.log_cursor is not None and key is not None:
+                    entries, self.log_cursor = PROGRESS_LOG.read_since(self.log_cursor)
+                    self.log_entries = (self.log_entries + simplify_log(entries))[-LOG_LINES:]
+                else:
+                    entries, self.log_cursor = PROGRESS_LOG.read_last(LOG_LINES)
+                    self.log_entries = simplify_log(entries)
+                self.log_key = key
+            return key, list(self.log_entries), self.log_cursor
+
+
+index_cache = DashboardIndex()
+
+
+def list_images():
+    return index_cache.images()[1]
+
+
+def etag_for(*keys):
+    return hashlib.sha1(repr(keys).encode()).hexdigest()[:20]
+
+
+def conditional(tag, build):
+    # 304 sans construire la réponse si le client a déjà cette version
+    if request.if_none_match.contains(tag):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(tag)
+    response.cache_control.no_cache = True
+    return response
+
+
+class EventHub:
+    # Un seul thread de surveillance par processus serveur, actif seulement
+    # tant qu'au moins un flux /events est ouvert. Il ne fait que des stat()
+    # de log.jsonl et de img/ ; à chaque changement il incrémente version
+    # et réveille les flux, qui lisent chacun leur propre delta.
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.version = 0
+        self.files = list_images()
+        self.subscribers = 0
+        self.running = False
+
+    def subscribe(self):
+        with self.cond:
+            self.subscribers += 1
+            if not self.running:
+                self.running = True
+                self.files = list_images()
+                threading.Thread(target=self.run, daemon=True).start()
+
+    def unsubscribe(self):
+        with self.cond:
+            self.subscribers -= 1
+
+    def wait(self, version, timeout):
+        with self.cond:
+            self.cond.wait_for(lambda: self.version != version, timeout)
+            return self.version, self.files
+
+    def snapshot(self):
+        try:
+            st = os.stat(LOG_FILE)
+            log_state = (st.st_ino, st.st_size)
+        except OSError:
+            log_state = None
+        try:
+            img_state = os.stat(IMG_FOLDER).st_mtime_ns
+        except OSError:
+            img_state = None
+        return log_state, img_state
+
+    def run(self):
+        last = self.snapshot()
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            current = self.snapshot()
+            with self.cond:
+                if self.subscribers == 0:
+                    self.running = False
+                    return
+                if current != last:
+                    if current[1] != last[1]:
+                        self.files = list_images()
+                    self.version += 1
+                    self.cond.notify_all()
+            last = current
+
+
+hub = EventHub()
+
+
+def sse(event, data, id=None):
+    msg = f"event: {event}\n"
+    if id is not None:
+        msg += f"id: {id}\n"
+    return msg + f"data: {json.dumps(data)}\n\n"
+
+
+def parse_cursor(value):
+    try:
+        inode, offset = (int(x) for x in value.split(":"))
+        return inode, offset
+    except (AttributeError, ValueError):
+        return None
+
+
+@app.route("/events")
+def events():
+    cursor = parse_cursor(request.headers.get("Last-Event-ID"))
+    if cursor is None and "inode" in request.args and "offset" in request.args:
+        cursor = parse_cursor(f"{request.args['inode']}:{request.args['offset']}")
+
+    def stream(cursor):
+        hub.subscribe()
+        try:
+            version, files = hub.version, hub.files
+            # état complet à la connexion, deltas ensuite
+            yield sse("solutions", {"files": files})
+            while True:
+                if cursor is None:
+                    entries, cursor = read_log()
+                else:
+                    entries, cursor = read_log_since(cursor)
+                if entries:
+                    yield sse("log", entries, id=f"{cursor[0]}:{cursor[1]}")
+
+                new_version, new_files = hub.wait(version, KEEPALIVE)
+                if new_version == version:
+                    yield ": keepalive\n\n"
+                    continue
+                version = new_version
+                added = [f for f in new_files if f not in files]
+                removed = [f for f in files if f not in new_files]
+                if added or removed:
+                    yield sse("solutions", {"added": added, "removed": removed})
+                files = new_files
+        finally:
+            hub.unsubscribe()
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream(cursor), mimetype="text/event-stream", headers=headers)
 
-def hash_log(entries):
-    return str(hash(json.dumps(entries)))
 
 @app.route("/")
 def index():
-    top_solutions = get_top_solutions()
-    files = []
-    if os.path.isdir(IMG_FOLDER):
-        files = sorted(f for f in os.listdir(IMG_FOLDER) if f.endswith(".jpg"))
+    img_key, files, solutions = index_cache.images()
+    log_key, log_entries, log_cursor = index_cache.log_tail()
 
-    log_entries = read_log()
-    return render_template_string(HTML_TEMPLATE, solutions=top_solutions, current_files=files, log_entries=log_entries)
+    def build():
+        return Response(render_template_string(
+            HTML_TEMPLATE, solutions=solutions[:TOP_SOLUTIONS], current_files=json.dumps(files),
+            log_entries=json.dumps(log_entries), log_cursor=json.dumps(log_cursor), log_lines=LOG_LINES))
+    return conditional(etag_for("index", img_key, log_key), build)
 
 @app.route("/file_list")
 def file_list():
-    files = []
-    if os.path.isdir(IMG_FOLDER):
-        files = sorted(f for f in os.listdir(IMG_FOLDER) if f.endswith(".jpg"))
-
-    return jsonify({"files": files})
+    img_key, files, _ = index_cache.images()
+    return conditional(etag_for("files", img_key), lambda: jsonify({"files": files}))
 
 @app.route("/log_data")
 def log_data():
-    entries = read_log()
-    return jsonify({"entries": entries, "hash": hash_log(entries)})
+    cursor = None
+    if "inode" in request.args and "offset" in request.args:
+        cursor = (request.args.get("inode", type=int), request.args.get("offset", type=int))
+    if cursor is not None and None in cursor:
+        cursor = None
+
+    def build():
+        if cursor is None:
+            entries, new_cursor = read_log()
+        else:
+            entries, new_cursor = read_log_since(cursor)
+        return jsonify({"entries": entries, "cursor": new_cursor})
+    log_key = stat_key(LOG_FILE, "st_ino", "st_size", "st_mtime_ns")
+    return conditional(etag_for("log", log_key, cursor), build)
+
+# Métriques Prometheus (format texte) lues dans le bloc d'état du solveur
+CHAIN_METRICS = [
+    # (nom, type, aide, champ ou fonction du bloc)
+    ("steps_total", "counter", "Annealing steps done by the chain.", "steps"),
+    ("steps_per_second", "gauge", "Steps per second over the last publication interval.", "steps_per_sec"),
+    ("score", "gauge", "Current score of the chain.", "score"),
+    ("best_score", "gauge", "Best score reached by the chain.", "best"),
+    ("temperature", "gauge", "Current annealing temperature.", "temperature"),
+    ("accepted_total", "counter", "Accepted moves.", "accepted"),
+    ("acceptance_rate", "gauge", "Accepted moves per step over the last publication interval.", "acceptance"),
+    ("boosts_total", "counter", "Temperature boosts after a stall.", "boosts"),
+    ("seconds_since_improvement", "gauge", "Seconds since the chain last improved its best score.",
+     lambda row, now, start: now - max(row["last_improvement"], start)),
+    ("seconds_since_update", "gauge", "Seconds since the chain last published its counters.",
+     lambda row, now, start: now - max(row["updated"], start)),
+]
+
+def metrics_text():
+    lines = []
+    def metric(name, kind, help, samples):
+        lines.append(f"# HELP edgepuzzle_{name} {help}")
+        lines.append(f"# TYPE edgepuzzle_{name} {kind}")
+        for labels, value in samples:
+            lines.append(f"edgepuzzle_{name}{labels} {value:.10g}")
+
+    try:
+        status = StatusBlock.attach()
+    except (FileNotFoundError, ValueError):
+        metric("solver_up", "gauge", "Whether the solver status block is present.", [("", 0)])
+        return "\n".join(lines) + "\n"
+    try:
+        now = time.time()
+        start = float(status.header["start_time"])
+        best = status.read_best()
+        chains = status.read_chains()
+    except TimeoutError:
+        # solveur tué au milieu d'une mise à jour du meilleur plateau
+        metric("solver_up", "gauge", "Whether the solver status block is present.", [("", 0)])
+        return "\n".join(lines) + "\n"
+    finally:
+        status.close()
+
+    metric("solver_up", "gauge", "Whether the solver status block is present.", [("", 1)])
+    metric("solver_uptime_seconds", "gauge", "Seconds since the solver started.", [("", now - start)])
+    metric("best_score", "gauge", "Best score over all chains.", [("", best["score"])])
+    for name, kind, help, field in CHAIN_METRICS:
+        samples = []
+        for chain, row in enumerate(chains):
+            value = field(row, now, start) if callable(field) else row[field]
+            samples.append((f'{{chain="{chain}"}}', float(value)))
+        metric(f"chain_{name}", kind, help, samples)
+    return "\n".join(lines) + "\n"
+
+@app.route("/metrics")
+def metrics():
+    return Response(metrics_text(), mimetype="text/plain; version=0.0.4")
 
 # Route pour favicon
 @app.route('/favicon.ico')
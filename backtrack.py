@@ -0,0 +1,363 @@
+import argparse
+import os
+import time
+import numpy as np
+from numba import njit
+from s_a import Puzzle, PUZZLE_CONF, PUZZLE_HINTS, ROT, CLS_INNER, cell_class, piece_class, \
+    neighbour_offsets, write_board_csv
+from ring import ring_cells
+
+# ==============================
+# Recherche exhaustive en profondeur
+# ==============================
+# Les cases sont remplies dans un ordre de placement fixé (ligne par ligne,
+# colonne par colonne, en spirale depuis le cadre, par diagonales, ou le
+# cadre d'abord puis l'intérieur ligne par ligne) ; à chaque profondeur, les
+# côtés déjà connus d'une case sont ceux tournés vers le cadre (gris) ou vers
+# une case déjà posée. Les candidats (pièce, rotation)
+# se lisent dans un index (couleur O, couleur N) -> pièces tournées : pour une
+# autre paire de côtés consécutifs (d, d+1), la même liste sert à une
+# rotation près. Les pièces disponibles sont un champ de bits.
+#
+# Un budget d'arêtes fausses peut être ouvert à partir de profondeurs
+# choisies (allowed[profondeur] = nombre total d'arêtes fausses tolérées) ;
+# les candidats parfaits sont toujours essayés en premier. Le noyau s'arrête
+# tous les max_nodes nœuds en gardant son état, ce qui permet les limites de
+# temps et de nœuds côté Python.
+
+FRAME = -2
+EMPTY = -1
+
+BT_DEPTH = 0
+BT_NODES = 1
+BT_BEST_DEPTH = 2
+BT_BEST_MISMATCHES = 3
+BT_STATUS = 4
+N_BT_STATE = 5
+
+BT_RUNNING = 0
+BT_SOLVED = 1
+BT_EXHAUSTED = 2
+
+NODE_CHUNK = 2_000_000          # nœuds par appel du noyau
+PROGRESS_INTERVAL = 5.0         # secondes entre deux lignes de progression
+
+# ==============================
+# Ordres de placement
+# ==============================
+def scan_order(height, width):
+    return [(i, j) for i in range(height) for j in range(width)]
+
+def column_order(height, width):
+    return [(i, j) for j in range(width) for i in range(height)]
+
+def spiral_order(height, width):
+    # anneaux successifs, du cadre vers le centre, chacun dans le sens horaire
+    cells = []
+    top, left = 0, 0
+    while height > 0 and width > 0:
+        if height == 1 or width == 1:
+            ring = [(i, j) for i in range(height) for j in range(width)]
+        else:
+            ring, _ = ring_cells(height, width)
+        cells += [(top + i, left + j) for i, j in ring]
+        top, left, height, width = top + 1, left + 1, height - 2, width - 2
+    return cells
+
+def diagonal_order(height, width):
+    return sorted(scan_order(height, width), key=lambda c: (c[0] + c[1], c[0]))
+
+def border_order(height, width):
+    # cadre complet dans le sens horaire, puis l'intérieur ligne par ligne
+    inner = lambda c: 0 < c[0] < height-1 and 0 < c[1] < width-1
+    return [c for c in spiral_order(height, width) if not inner(c)] + \
+        [c for c in scan_order(height, width) if inner(c)]
+
+ORDERS = {
+    'scan': scan_order,
+    'column': column_order,
+    'spiral': spiral_order,
+    'diagonal': diagonal_order,
+    'border': border_order,
+}
+
+def parse_budgets(specs, length):
+    # "PROFONDEUR:K" : au plus K arêtes fausses au total à partir de cette
+    # profondeur
+    allowed = np.zeros(length + 1, dtype=np.int64)
+    for spec in specs:
+        depth, k = (int(x) for x in spec.split(':'))
+        allowed[depth:] = np.maximum(allowed[depth:], k)
+    return allowed
+
+# ==============================
+# Index des candidats
+# ==============================
+def csr(keys, values, n_keys):
+    # values regroupées par clé, dans leur ordre d'origine
+    idx = np.argsort(keys, kind='stable')
+    off = np.zeros(n_keys + 1, dtype=np.int64)
+    np.add.at(off, np.asarray(keys, dtype=np.int64) + 1, 1)
+    return np.cumsum(off), np.asarray(values, dtype=np.int32)[idx]
+
+class Backtracker:
+    def __init__(self, puzzle, order='scan', budgets=(), seed=None):
+        self.puzzle = puzzle
+        height, width = puzzle.height, puzzle.width
+        t_rot, N = puzzle.t_rot, puzzle.N     # mêmes pièces tournées que le recuit
+        n_colors = int(t_rot.max()) + 2        # couleur c à l'indice c+1, gris à 0
+        piece_cls = np.array([piece_class(t_rot, p) for p in range(N)], dtype=np.int64)
+
+        # pièces (hors indices) dans l'ordre de la graine
+        fixed = set(puzzle.fixed_p[puzzle.fixed].tolist())
+        pieces = [p for p in range(N) if p not in fixed]
+        if seed is not None:
+            pieces = list(np.random.default_rng(seed).permutation(pieces))
+        rotated = np.array([p*ROT + r for p in pieces for r in range(ROT)], dtype=np.int64)
+        west, north = t_rot[rotated, 3].astype(np.int64) + 1, t_rot[rotated, 0].astype(np.int64) + 1
+        pair_off, pair_s = csr(west*n_colors + north, rotated, n_colors*n_colors)
+        side_off, side_s = csr(west, rotated, n_colors)
+        class_off, class_s = csr(piece_cls[rotated // ROT], rotated, CLS_INNER + 1)
+        self.index = (t_rot, n_colors, pair_off, pair_s, side_off, side_s, class_off, class_s, piece_cls)
+
+        # plan : pour chaque profondeur, case, côtés connus et clé de l'index
+        self.order = order
+        self.cells = [c for c in ORDERS[order](height, width) if not puzzle.fixed[c]]
+        placed = puzzle.fixed.copy()
+        order_known, order_frame, order_pair, order_side = [], [], [], []
+        for i, j in self.cells:
+            frame = [i == 0, j == width-1, i == height-1, j == 0]
+            inner = [not frame[d] and bool(placed[i + di, j + dj])
+                     for d, (di, dj) in enumerate(((-1, 0), (0, 1), (1, 0), (0, -1)))]
+            known = [frame[d] or inner[d] for d in range(4)]
+            # paire de côtés consécutifs connus la plus sélective, (O, N) à
+            # égalité ; sinon un seul côté connu, de préférence une pièce
+            pairs = [d for d in (3, 0, 1, 2) if known[d] and known[(d+1) % 4]]
+            pair = max(pairs, key=lambda d: inner[d] + inner[(d+1) % 4], default=-1)
+            sides = [d for d in (3, 0, 1, 2) if known[d]]
+            side = max(sides, key=lambda d: inner[d], default=-1) if pair < 0 else -1
+            order_known.append(sum(1 << d for d in range(4) if known[d]))
+            order_frame.append(sum(1 << d for d in range(4) if frame[d]))
+            order_pair.append(pair)
+            order_side.append(side)
+            placed[i, j] = True
+        self.plan = (
+            np.array([puzzle.flat_index(i, j) for i, j in self.cells], dtype=np.int64),
+            np.array(order_known, dtype=np.int64),
+            np.array(order_frame, dtype=np.int64),
+            np.array(order_pair, dtype=np.int64),
+            np.array(order_side, dtype=np.int64),
+            np.array([cell_class(puzzle, i, j) for i, j in self.cells], dtype=np.int64),
+            neighbour_offsets(width),
+        )
+        self.allowed = parse_budgets(budgets, len(self.cells))
+        self.reset()
+
+    def initial_cells(self):
+        # plateau aplati : cadre, cases vides et pièces des indices
+        puzzle = self.puzzle
+        cells = np.full((puzzle.height+2, puzzle.width+2), FRAME, dtype=np.int32)
+        cells[1:-1, 1:-1] = np.where(puzzle.fixed, puzzle.fixed_p.astype(np.int32)*ROT + puzzle.fixed_r, EMPTY)
+        return cells.ravel()
+
+    def initial_avail(self):
+        avail = np.zeros((self.puzzle.N + 63) // 64, dtype=np.uint64)
+        fixed = set(self.puzzle.fixed_p[self.puzzle.fixed].tolist())
+        for p in range(self.puzzle.N):
+            if p not in fixed:
+                avail[p >> 6] |= np.uint64(1) << np.uint64(p & 63)
+        return avail
+
+    def reset(self):
+        L = len(self.cells)
+        class_off = self.index[6]
+        width = max(int(np.max(np.diff(class_off))), 1)
+        self.work = self.initial_cells()
+        self.best_cells = self.work.copy()
+        self.avail = self.initial_avail()
+        self.cand_s = np.zeros((max(L, 1), width), dtype=np.int32)
+        self.cand_mis = np.zeros((max(L, 1), width), dtype=np.int8)
+        self.count = np.zeros(L + 1, dtype=np.int64)
+        self.ptr = np.full(L + 1, -1, dtype=np.int64)
+        self.mism = np.zeros(L + 1, dtype=np.int64)
+        self.need = np.zeros(4, dtype=np.int64)
+        self.state = np.zeros(N_BT_STATE, dtype=np.int64)
+
+    def step(self, max_nodes):
+        backtrack_numba(self.work, self.best_cells, self.avail, self.allowed, self.cand_s, self.cand_mis,
+                        self.count, self.ptr, self.mism, self.need, self.state, max_nodes,
+                        *self.index, *self.plan)
+        return int(self.state[BT_STATUS])
+
+    def run(self, time_limit=None, max_nodes=None, progress=None):
+        # recherche jusqu'à la solution, l'épuisement ou une des limites
+        start = time.time()
+        last = start
+        while self.state[BT_STATUS] == BT_RUNNING:
+            chunk = NODE_CHUNK
+            if max_nodes is not None:
+                chunk = min(chunk, max_nodes - int(self.state[BT_NODES]))
+                if chunk <= 0:
+                    break
+            if time_limit is not None and time.time() - start >= time_limit:
+                break
+            self.step(chunk)
+            if progress is not None and time.time() - last >= PROGRESS_INTERVAL:
+                last = time.time()
+                progress(self, last - start)
+        return int(self.state[BT_STATUS])
+
+    def best_board(self):
+        # (board_p, board_r, placed) du plateau partiel le plus profond
+        puzzle = self.puzzle
+        inner = self.best_cells.reshape(puzzle.height+2, puzzle.width+2)[1:-1, 1:-1]
+        placed = inner >= 0
+        return np.where(placed, inner // ROT, 0), np.where(placed, inner % ROT, 0), placed
+
+    def save_best(self, filename):
+        board_p, board_r, placed = self.best_board()
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        write_board_csv(filename, board_p, board_r, placed)
+
+# ==============================
+# Noyaux compilés
+# ==============================
+@njit(cache=True)
+def expand_numba(depth, cells, avail, budget, need, out_s, out_mis,
+                 t_rot, n_colors, pair_off, pair_s, side_off, side_s, class_off, class_s, piece_cls,
+                 order_pos, order_known, order_frame, order_pair, order_side, order_cls, offsets):
+    # Candidats de la case de profondeur depth dans out_s / out_mis (arêtes
+    # fausses) : les parfaits lus dans l'index, puis, si budget > 0, ceux de
+    # la classe de la case ayant de 1 à budget arêtes fausses. Les côtés gris
+    # restent toujours face au cadre. Retourne leur nombre.
+    pos = order_pos[depth]
+    known = order_known[depth]
+    frame = order_frame[depth]
+    cls = order_cls[depth]
+    for d in range(4):
+        if (known >> d) & 1:
+            nb = cells[pos + offsets[d]]
+            need[d] = -1 if nb == FRAME else t_rot[nb, (d+2) % 4]
+
+    d = order_pair[depth]
+    if d >= 0:
+        key = (need[d]+1)*n_colors + need[(d+1) % 4]+1
+        lo, hi, src = pair_off[key], pair_off[key+1], pair_s
+    elif order_side[depth] >= 0:
+        d = order_side[depth]
+        key = need[d]+1
+        lo, hi, src = side_off[key], side_off[key+1], side_s
+    else:
+        d = 3
+        lo, hi, src = class_off[cls], class_off[cls+1], class_s
+    # la liste donne (O, N) = paire cherchée ; la case veut (d, d+1)
+    shift = (7 - d) % 4
+
+    count = 0
+    for pass_ in range(2):
+        if pass_ == 1:
+            if budget <= 0:
+                break
+            lo, hi, src, shift = class_off[cls], class_off[cls+1], class_s, 0
+        for k in range(lo, hi):
+            p = src[k] // 4
+            if piece_cls[p] != cls or (avail[p >> 6] >> np.uint64(p & 63)) & np.uint64(1) == 0:
+                continue
+            s = p*4 + (src[k] % 4 + shift) % 4
+            mis = 0
+            for e in range(4):
+                if (frame >> e) & 1:
+                    if t_rot[s, e] != -1:
+                        mis = -1
+                        break
+                elif (known >> e) & 1 and t_rot[s, e] != need[e]:
+                    mis += 1
+            if mis < 0 or (pass_ == 0 and mis != 0) or (pass_ == 1 and (mis == 0 or mis > budget)):
+                continue
+            out_s[count] = s
+            out_mis[count] = mis
+            count += 1
+    return count
+
+@njit(cache=True)
+def backtrack_numba(cells, best_cells, avail, allowed, cand_s, cand_mis, count, ptr, mism, need, state,
+                    max_nodes, t_rot, n_colors, pair_off, pair_s, side_off, side_s, class_off, class_s,
+                    piece_cls, order_pos, order_known, order_frame, order_pair, order_side, order_cls, offsets):
+    # Profondeur d'abord itérative : ptr[k] est le prochain candidat de la
+    # case k (-1 : pas encore énumérés), mism[k] le nombre d'arêtes fausses
+    # des k premières cases. S'arrête après max_nodes poses, l'état restant
+    # dans les tableaux pour l'appel suivant.
+    L = order_pos.shape[0]
+    depth = state[BT_DEPTH]
+    nodes = 0
+    while nodes < max_nodes:
+        if depth == L:
+            state[BT_STATUS] = BT_SOLVED
+            break
+        if ptr[depth] < 0:
+            count[depth] = expand_numba(depth, cells, avail, allowed[depth] - mism[depth], need,
+                                        cand_s[depth], cand_mis[depth],
+                                        t_rot, n_colors, pair_off, pair_s, side_off, side_s,
+                                        class_off, class_s, piece_cls,
+                                        order_pos, order_known, order_frame, order_pair, order_side, order_cls, offsets)
+            ptr[depth] = 0
+        if ptr[depth] < count[depth]:
+            k = ptr[depth]
+            ptr[depth] += 1
+            s = cand_s[depth, k]
+            p = s // 4
+            cells[order_pos[depth]] = s
+            avail[p >> 6] &= ~(np.uint64(1) << np.uint64(p & 63))
+            mism[depth+1] = mism[depth] + cand_mis[depth, k]
+            nodes += 1
+            depth += 1
+            ptr[depth] = -1
+            if depth > state[BT_BEST_DEPTH] or \
+                    (depth == state[BT_BEST_DEPTH] and mism[depth] < state[BT_BEST_MISMATCHES]):
+                state[BT_BEST_DEPTH] = depth
+                state[BT_BEST_MISMATCHES] = mism[depth]
+                best_cells[:] = cells
+        else:
+            depth -= 1
+            if depth < 0:
+                state[BT_STATUS] = BT_EXHAUSTED
+                depth = 0
+                break
+            p = cells[order_pos[depth]] // 4
+            avail[p >> 6] |= np.uint64(1) << np.uint64(p & 63)
+            cells[order_pos[depth]] = EMPTY
+    state[BT_DEPTH] = depth
+    state[BT_NODES] += nodes
+
+def report(bt, elapsed):
+    nodes = int(bt.state[BT_NODES])
+    print(f"| {bt.order.upper()} | {nodes:,} NODES | {nodes / max(elapsed, 1e-9):,.0f} NODES/S | "
+          f"DEPTH {int(bt.state[BT_DEPTH])} | BEST {int(bt.state[BT_BEST_DEPTH])}/{len(bt.cells)} "
+          f"({int(bt.state[BT_BEST_MISMATCHES])} MISMATCHES) |")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-conf', default=PUZZLE_CONF)
+    parser.add_argument('-hints', default=PUZZLE_HINTS)
+    parser.add_argument('-order', choices=sorted(ORDERS), default='scan')
+    parser.add_argument('-mismatch', nargs='*', default=[], metavar='DEPTH:K',
+                        help='Allow up to K mismatched edges in total from DEPTH on')
+    parser.add_argument('-time', type=float, default=60.0, help='Time limit in seconds')
+    parser.add_argument('-max-nodes', dest='max_nodes', type=int, default=None)
+    parser.add_argument('-seed', type=int, default=None, help='Shuffle the candidate order')
+    parser.add_argument('-out', default=None, help='CSV of the deepest board')
+    args = parser.parse_args()
+
+    puzzle = Puzzle(args.conf, args.hints or None)
+    bt = Backtracker(puzzle, args.order, args.mismatch, args.seed)
+    bt.step(0)  # compilation
+    start = time.time()
+    status = bt.run(args.time, args.max_nodes, report)
+    report(bt, time.time() - start)
+    if status == BT_SOLVED:
+        print("| SOLVED |")
+    elif status == BT_EXHAUSTED:
+        print("| SEARCH EXHAUSTED |")
+    out = args.out or f"solutions/backtrack_{args.order}_{int(bt.state[BT_BEST_DEPTH])}.csv"
+    bt.save_best(out)
+    print(f"-> {out}")
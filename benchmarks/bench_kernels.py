@@ -0,0 +1,377 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from numba import njit
+
+# Micro-benchmarks des noyaux du solveur et des chemins de score de core/,
+# sur des plateaux fixés par la graine. À lancer depuis n'importe où :
+#
+#   python benchmarks/bench_kernels.py -out avant.json
+#   python benchmarks/bench_kernels.py -out apres.json -compare avant.json
+#
+# Le premier appel de chaque noyau (compilation JIT, ou chargement depuis le
+# cache disque de numba) est mesuré à part ; -cold utilise un cache vide pour
+# mesurer la vraie compilation. Les noyaux sont appelés dans l'ordre de leurs
+# dépendances pour que chaque premier appel ne compile que lui-même.
+#
+# En régime établi, les petits noyaux sont répétés n fois dans une boucle
+# compilée (kernel_loops) : appelés un par un depuis Python, leur temps
+# serait surtout celui de l'appel d'une fonction numba, mesuré à part
+# (njit_dispatch). ns_per_op est alors le temps d'un appel interne.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEED = 1234
+MIN_TIME = 0.2          # durée minimale d'une répétition (s)
+REPEATS = 5
+ANNEAL_STEPS = 20000    # pas par appel de anneal_batch_numba
+ANNEAL_T = 1.0          # température fixe du recuit mesuré
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_meta(args):
+    import numba
+    return {
+        'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'numba': numba.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or None,
+        'cpus': os.cpu_count(),
+        'conf': args.conf,
+        'hints': args.hints,
+        'seed': args.seed,
+        'cold': args.cold,
+    }
+
+
+def measure_n(run, setup=None, min_time=MIN_TIME, repeats=REPEATS):
+    # Temps par opération en ns, run(n) faisant n opérations : n est doublé
+    # jusqu'à dépasser min_time, setup() (non chronométré) est rejoué avant
+    # chaque répétition.
+    n = 1
+    while True:
+        if setup:
+            setup()
+        start = time.perf_counter_ns()
+        run(n)
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_time * 1e9:
+            break
+        n *= 2
+    times = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter_ns()
+        run(n)
+        times.append((time.perf_counter_ns() - start) / n)
+    return {'ns_per_op': min(times), 'ns_per_op_median': float(np.median(times)),
+            'ops': n, 'repeats': repeats}
+
+
+def measure(op, setup=None, min_time=MIN_TIME, repeats=REPEATS):
+    # op() appelé n fois depuis Python
+    def run(n):
+        for _ in range(n):
+            op()
+    return measure_n(run, setup, min_time, repeats)
+
+
+@njit(cache=True)
+def noop_numba():
+    pass
+
+
+def kernel_loops(s_a):
+    # Boucles compilées répétant chaque petit noyau n fois. Les noyaux sont
+    # lus dans s_a (importé après le chdir), d'où les fermetures ; les scores
+    # sont sommés pour que le compilateur ne supprime pas les appels.
+    score_numba = s_a.score_numba
+    flatten_board_numba = s_a.flatten_board_numba
+    unflatten_board_numba = s_a.unflatten_board_numba
+    local_score_numba = s_a.local_score_numba
+    optimize_local = s_a.optimize_local
+    propose_move_inplace_numba = s_a.propose_move_inplace_numba
+    undo_move_numba = s_a.undo_move_numba
+
+    @njit
+    def score_loop(n, board_p, board_r, t_rot, border_w):
+        total = 0
+        for _ in range(n):
+            total += score_numba(board_p, board_r, t_rot, border_w)
+        return total
+
+    @njit
+    def flatten_loop(n, board_p, board_r, cells, frame):
+        for _ in range(n):
+            flatten_board_numba(board_p, board_r, cells, frame)
+
+    @njit
+    def unflatten_loop(n, cells, board_p, board_r):
+        for _ in range(n):
+            unflatten_board_numba(cells, board_p, board_r)
+
+    @njit
+    def local_score_loop(n, cells, words, match, offsets, positions):
+        total = 0
+        for _ in range(n):
+            total += local_score_numba(cells, words, match, offsets, positions)
+        return total
+
+    @njit
+    def optimize_local_loop(n, cells, words, offsets, color_class, rot_table, positions):
+        for _ in range(n):
+            optimize_local(cells, words, offsets, color_class, rot_table, positions)
+
+    @njit
+    def propose_inplace_loop(n, cells, words, match, offsets, color_class, rot_table,
+                             move_slots, move_bounds, move_cdf, rot_slots, affected, undo):
+        # proposition puis annulation : le plateau reste celui de départ
+        total = 0
+        for _ in range(n):
+            total += propose_move_inplace_numba(cells, words, match, offsets, color_class, rot_table,
+                                                move_slots, move_bounds, move_cdf, rot_slots, affected, undo)
+            undo_move_numba(cells, affected, undo)
+        return total
+
+    return {
+        'score_numba': score_loop,
+        'flatten_board_numba': flatten_loop,
+        'unflatten_board_numba': unflatten_loop,
+        'local_score_numba': local_score_loop,
+        'optimize_local': optimize_local_loop,
+        'propose_move_inplace_numba': propose_inplace_loop,
+    }
+
+
+def measure_each(op, setup, repeats):
+    # Opérations qui modifient leur entrée : setup() avant chaque appel
+    times = []
+    for _ in range(repeats):
+        arg = setup()
+        start = time.perf_counter_ns()
+        op(arg)
+        times.append(time.perf_counter_ns() - start)
+    return {'ns_per_op': min(times), 'ns_per_op_median': float(np.median(times)),
+            'ops': 1, 'repeats': repeats}
+
+
+def plain_board(puzzle, rng, rot):
+    # pièces libres permutées au hasard, sans passer par un noyau
+    board_p, board_r = puzzle.fixed_p.copy(), puzzle.fixed_r.copy()
+    free = ~puzzle.fixed
+    placed = set(puzzle.fixed_p[puzzle.fixed].tolist())
+    board_p[free] = rng.permutation([p for p in range(puzzle.N) if p not in placed])
+    board_r[free] = rng.integers(0, rot, free.sum())
+    return board_p, board_r
+
+
+def plain_flat(puzzle, board_p, board_r, rot):
+    # plateau aplati avec son cadre (voir s_a.py), sans passer par un noyau
+    cells = np.full((puzzle.height + 2, puzzle.width + 2), len(puzzle.words) - 1, dtype=np.int16)
+    cells[1:-1, 1:-1] = board_p * rot + board_r
+    return cells.ravel()
+
+
+def bench_kernels(s_a, puzzle, seed, min_time, repeats):
+    rng = np.random.default_rng(seed)
+    board_p, board_r = plain_board(puzzle, rng, s_a.ROT)
+    t_rot, border_w = puzzle.t_rot, puzzle.border_w
+    words, match, offsets = puzzle.words, puzzle.match, puzzle.offsets
+    color_class, rot_table = puzzle.color_class, puzzle.rot_table
+    move_tables = s_a.build_move_tables(puzzle, s_a.TYPED_MOVES)
+    cells = puzzle.cells()
+    pair = np.array([puzzle.flat_index(*cells[k]) for k in rng.choice(len(cells), 2, replace=False)],
+                    dtype=np.int64)
+    affected = np.zeros(2, dtype=np.int64)
+    undo = np.zeros(2, dtype=np.int16)
+    work_p, work_r = board_p.copy(), board_r.copy()
+    work_cells = plain_flat(puzzle, board_p, board_r, s_a.ROT)
+    frame = len(words) - 1
+
+    def reset_work():
+        work_p[...] = board_p
+        work_r[...] = board_r
+        work_cells[...] = plain_flat(puzzle, board_p, board_r, s_a.ROT)
+        s_a.seed_numba(seed)
+
+    def anneal_state():
+        # meilleur score inatteignable : le noyau ne rend jamais la main avant
+        # d'avoir fait tous ses pas
+        state = np.zeros(s_a.N_STATE, dtype=np.int64)
+        state[s_a.ST_SCORE] = s_a.score_numba(work_p, work_r, t_rot, border_w)
+        state[s_a.ST_BEST] = np.iinfo(np.int64).max
+        return state
+
+    state = np.zeros(s_a.N_STATE, dtype=np.int64)
+    best_p, best_r = board_p.copy(), board_r.copy()
+    no_boost = np.iinfo(np.int64).max
+
+    def anneal():
+        s_a.anneal_batch_numba(work_p, work_r, best_p, best_r, *puzzle.tables, *move_tables,
+                               state, ANNEAL_T, ANNEAL_STEPS, 1.0, ANNEAL_T, no_boost,
+                               ANNEAL_T, ANNEAL_T, -1, s_a.EXP_TABLE_SIZE, s_a.EXP_TABLE_REFRESH)
+
+    def propose_inplace():
+        s_a.propose_move_inplace_numba(work_cells, *puzzle.tables, *move_tables, affected, undo)
+        s_a.undo_move_numba(work_cells, affected, undo)
+
+    # (nom, appel), dans l'ordre des dépendances entre noyaux
+    kernels = [
+        ('seed_numba', lambda: s_a.seed_numba(seed)),
+        ('score_numba', lambda: s_a.score_numba(work_p, work_r, t_rot, border_w)),
+        ('flatten_board_numba', lambda: s_a.flatten_board_numba(work_p, work_r, work_cells, frame)),
+        ('unflatten_board_numba', lambda: s_a.unflatten_board_numba(work_cells, work_p, work_r)),
+        ('local_score_numba', lambda: s_a.local_score_numba(work_cells, words, match, offsets, pair)),
+        ('optimize_local', lambda: s_a.optimize_local(work_cells, words, offsets, color_class, rot_table, pair)),
+        ('undo_move_numba', lambda: s_a.undo_move_numba(work_cells, affected, undo)),
+        ('propose_move_inplace_numba', propose_inplace),
+        ('anneal_batch_numba', anneal),
+    ]
+
+    jit, results = {}, {}
+    for name, call in kernels:
+        work_p[...], work_r[...] = board_p, board_r
+        work_cells[...] = plain_flat(puzzle, board_p, board_r, s_a.ROT)
+        if name == 'anneal_batch_numba':
+            state[...] = anneal_state()
+        start = time.perf_counter()
+        call()
+        jit[name] = time.perf_counter() - start
+
+    # plateau de départ du solveur pour les mesures en régime établi
+    np.random.seed(seed)
+    board_p[...], board_r[...] = s_a.initial_board(puzzle)
+
+    # arguments des boucles compilées, mêmes tableaux que les appels directs
+    loops = kernel_loops(s_a)
+    loop_args = {
+        'score_numba': (work_p, work_r, t_rot, border_w),
+        'flatten_board_numba': (work_p, work_r, work_cells, frame),
+        'unflatten_board_numba': (work_cells, work_p, work_r),
+        'local_score_numba': (work_cells, words, match, offsets, pair),
+        'optimize_local': (work_cells, words, offsets, color_class, rot_table, pair),
+        'propose_move_inplace_numba': (work_cells, *puzzle.tables, *move_tables, affected, undo),
+    }
+    for name, loop in loops.items():
+        loop(1, *loop_args[name])
+    noop_numba()
+
+    results['njit_dispatch'] = measure(noop_numba, None, min_time, repeats)
+    for name, call in kernels:
+        if name in ('seed_numba', 'undo_move_numba'):
+            continue
+        if name in loops:
+            results[name] = measure_n(lambda n, loop=loops[name], args=loop_args[name]: loop(n, *args),
+                                      reset_work, min_time, repeats)
+            continue
+
+        def setup():
+            reset_work()
+            state[...] = anneal_state()
+        results[name] = measure(call, setup, min_time, repeats)
+
+    r = results['anneal_batch_numba']
+    r['steps_per_op'] = ANNEAL_STEPS
+    r['steps_per_sec'] = ANNEAL_STEPS / (r['ns_per_op'] * 1e-9)
+    r['ns_per_step'] = r['ns_per_op'] / ANNEAL_STEPS
+    return jit, results
+
+
+def bench_core(conf, hints, seed, min_time, repeats):
+    from core.defs import PuzzleDefinition
+    from core import board as board_module
+
+    def load():
+        puzzle_def = PuzzleDefinition()
+        puzzle_def.load(conf, hints)
+        return puzzle_def
+
+    puzzle_def = load()
+
+    def random_board():
+        random.seed(seed)
+        board = board_module.Board(puzzle_def)
+        board.randomize()
+        return board
+
+    board = random_board()
+    return {
+        'PuzzleDefinition.load': measure(load, None, min_time, repeats),
+        'Board.evaluate': measure(board.evaluate, None, min_time, repeats),
+        'Board.heuristic_orientation': measure_each(lambda b: b.heuristic_orientation(), random_board,
+                                                    max(repeats, 3)),
+    }
+
+
+def compare(results, previous):
+    # rapport nouveau / ancien du temps par appel, < 1 étant plus rapide
+    print(f"\n{'':<30}{'avant':>14}{'après':>14}{'ratio':>8}")
+    for name, r in results.items():
+        old = previous.get('results', {}).get(name)
+        if old is None:
+            continue
+        print(f"{name:<30}{old['ns_per_op']:>12.0f}ns{r['ns_per_op']:>12.0f}ns"
+              f"{r['ns_per_op'] / old['ns_per_op']:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-conf", default="data/eternity2/eternity2_256_1.csv")
+    parser.add_argument("-hints", default="data/eternity2/eternity2_256_hints.csv")
+    parser.add_argument("-seed", type=int, default=SEED)
+    parser.add_argument("-min-time", dest="min_time", type=float, default=MIN_TIME)
+    parser.add_argument("-repeats", type=int, default=REPEATS)
+    parser.add_argument("-cold", action="store_true", help="Empty numba cache: first calls include compilation")
+    parser.add_argument("-out", default="bench_kernels.json")
+    parser.add_argument("-compare", default=None, help="Previous JSON result to compare with")
+    args = parser.parse_args()
+
+    out = os.path.abspath(args.out)
+    previous_path = os.path.abspath(args.compare) if args.compare else None
+    if args.cold:
+        # avant tout import de numba
+        os.environ['NUMBA_CACHE_DIR'] = tempfile.mkdtemp(prefix="numba_cold_")
+    # le solveur lit ses données en chemins relatifs à la racine du dépôt
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    import s_a
+
+    puzzle = s_a.Puzzle(args.conf, args.hints or None)
+    jit, results = bench_kernels(s_a, puzzle, args.seed, args.min_time, args.repeats)
+    results.update(bench_core(args.conf, args.hints or None, args.seed, args.min_time, args.repeats))
+
+    report = {'meta': run_meta(args), 'jit_first_call_s': jit, 'results': results}
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'first call (JIT)':<30}")
+    for name, seconds in jit.items():
+        print(f"  {name:<28}{seconds * 1e3:>10.1f} ms")
+    print(f"{'steady state':<30}")
+    for name, r in results.items():
+        extra = f"  {r['steps_per_sec']:,.0f} steps/s" if 'steps_per_sec' in r else ""
+        print(f"  {name:<28}{r['ns_per_op']:>14,.0f} ns/op{extra}")
+    print(f"-> {out}")
+
+    if previous_path:
+        with open(previous_path) as f:
+            compare(results, json.load(f))
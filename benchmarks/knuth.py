@@ -0,0 +1,181 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from numba import njit
+
+from bench_kernels import ROOT, git_commit
+
+sys.path.insert(0, ROOT)
+from backtrack import Backtracker, ORDERS, BT_NODES, EMPTY, expand_numba  # noqa: E402
+
+# Estimation de la taille de l'arbre de backtrack.py pour chaque ordre de
+# placement et chaque budget d'arêtes fausses, avant d'y consacrer des
+# cœurs :
+#
+#   python benchmarks/knuth.py -probes 200000 -orders scan spiral border
+#   python benchmarks/knuth.py -schedules "" "180:2,200:6" -out knuth.json
+#
+# Estimateur de Knuth : une sonde descend l'arbre en choisissant à chaque
+# profondeur un candidat au hasard parmi les c_k que le backtracker
+# énumérerait (mêmes index, même budget) ; le produit c_0...c_(k-1) est un
+# estimateur sans biais du nombre de nœuds à la profondeur k, et sa valeur à
+# la dernière profondeur celui du nombre de solutions. La moyenne sur les
+# sondes donne les nœuds par profondeur et la taille totale de l'arbre.
+#
+# Le débit du backtracker (nœuds/s) est mesuré sur -rate-time secondes pour
+# chaque configuration ; solutions/s = solutions / nœuds * débit est le
+# rythme attendu d'un parcours complet de l'arbre.
+
+PROBES = 100000
+RATE_TIME = 5.0
+EVERY = 16              # profondeurs affichées dans le tableau par profondeur
+
+
+@njit(cache=True)
+def knuth_probes_numba(n_probes, cells, avail, allowed, cand_s, cand_mis, need, est, totals,
+                       t_rot, n_colors, pair_off, pair_s, side_off, side_s, class_off, class_s, piece_cls,
+                       order_pos, order_known, order_frame, order_pair, order_side, order_cls, offsets):
+    # est[k] += produit des c_i jusqu'à la profondeur k ; totals reçoit la
+    # somme et la somme des carrés de la taille estimée de l'arbre par sonde
+    # (racine exclue, comme tree_nodes), puis le nombre de sondes arrivées à
+    # un plateau complet.
+    # cells et avail sont rendus dans leur état initial après chaque sonde.
+    L = order_pos.shape[0]
+    for _ in range(n_probes):
+        weight = 1.0
+        tree = 0.0
+        mism = 0
+        depth = 0
+        est[0] += 1.0
+        while depth < L:
+            c = expand_numba(depth, cells, avail, allowed[depth] - mism, need, cand_s, cand_mis,
+                             t_rot, n_colors, pair_off, pair_s, side_off, side_s, class_off, class_s, piece_cls,
+                             order_pos, order_known, order_frame, order_pair, order_side, order_cls, offsets)
+            if c == 0:
+                break
+            weight *= c
+            k = np.random.randint(c)
+            p = cand_s[k] // 4
+            cells[order_pos[depth]] = cand_s[k]
+            avail[p >> 6] &= ~(np.uint64(1) << np.uint64(p & 63))
+            mism += cand_mis[k]
+            depth += 1
+            est[depth] += weight
+            tree += weight
+        totals[0] += tree
+        totals[1] += tree * tree
+        if depth == L:
+            totals[2] += 1.0
+        for d in range(depth):
+            p = cells[order_pos[d]] // 4
+            avail[p >> 6] |= np.uint64(1) << np.uint64(p & 63)
+            cells[order_pos[d]] = EMPTY
+
+
+def estimate(s_a, puzzle, order, budgets, probes, seed):
+    bt = Backtracker(puzzle, order, budgets)
+    L = len(bt.cells)
+    est = np.zeros(L + 1, dtype=np.float64)
+    totals = np.zeros(3, dtype=np.float64)
+    s_a.seed_numba(seed)
+    start = time.perf_counter()
+    knuth_probes_numba(probes, bt.work, bt.avail, bt.allowed, bt.cand_s[0], bt.cand_mis[0], bt.need,
+                       est, totals, *bt.index, *bt.plan)
+    elapsed = time.perf_counter() - start
+    nodes = est / probes
+    # taille de l'arbre hors racine, égale à np.sum(nodes[1:])
+    tree = totals[0] / probes
+    # erreur type relative de la taille de l'arbre (inf si les carrés débordent)
+    var = max(totals[1] / probes - tree * tree, 0.0)
+    rel_err = math.sqrt(var / probes) / tree if tree > 0 else 0.0
+    return bt, {
+        'nodes_per_depth': nodes.tolist(),
+        'tree_nodes': float(tree),
+        'tree_rel_err': rel_err,
+        'solutions': float(nodes[L]),
+        # peu de sondes complètes : estimation des solutions peu fiable
+        'solution_probes': int(totals[2]),
+        'probe_time': elapsed,
+    }
+
+
+def node_rate(bt, seconds):
+    # nœuds/s du backtracker sur cette configuration, compilation exclue
+    bt.step(0)
+    start = time.perf_counter()
+    bt.run(time_limit=seconds)
+    return int(bt.state[BT_NODES]) / (time.perf_counter() - start)
+
+
+def log10(x):
+    return f"{math.log10(x):.1f}" if x > 0 else "-"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-conf", default="data/eternity2/eternity2_256_1.csv")
+    parser.add_argument("-hints", default="data/eternity2/eternity2_256_hints.csv")
+    parser.add_argument("-orders", nargs="+", choices=sorted(ORDERS), default=sorted(ORDERS))
+    parser.add_argument("-schedules", nargs="+", default=[""], metavar="DEPTH:K,...",
+                        help="Mismatch schedules to compare, \"\" for a perfect search")
+    parser.add_argument("-probes", type=int, default=PROBES)
+    parser.add_argument("-seed", type=int, default=0)
+    parser.add_argument("-rate-time", dest="rate_time", type=float, default=RATE_TIME,
+                        help="Seconds of real search per configuration to measure nodes/s")
+    parser.add_argument("-every", type=int, default=EVERY)
+    parser.add_argument("-out", default="knuth.json")
+    args = parser.parse_args()
+
+    out = os.path.abspath(args.out)
+    os.chdir(ROOT)
+    import s_a
+
+    puzzle = s_a.Puzzle(args.conf, args.hints or None)
+    configs = []
+    for schedule in args.schedules:
+        budgets = [spec for spec in schedule.split(",") if spec]
+        for order in args.orders:
+            bt, result = estimate(s_a, puzzle, order, budgets, args.probes, args.seed)
+            rate = node_rate(bt, args.rate_time) if args.rate_time > 0 else float("nan")
+            result.update({
+                'order': order,
+                'schedule': schedule,
+                'nodes_per_sec': rate,
+                'solutions_per_sec': result['solutions'] / result['tree_nodes'] * rate
+                if result['tree_nodes'] > 0 else 0.0,
+                # débit nul (run trop court ou dégénéré) : parcours sans fin
+                'exhaust_seconds': result['tree_nodes'] / rate if rate != 0 else math.inf,
+            })
+            configs.append(result)
+            print(f"{order:<10}{schedule or '-':<16}arbre 10^{log10(result['tree_nodes']):<6}"
+                  f"(±{100 * result['tree_rel_err']:.0f}%)  solutions 10^{log10(result['solutions']):<5}"
+                  f"({result['solution_probes']} sondes)"
+                  f"{rate:>12,.0f} nœuds/s  {result['solutions_per_sec']:.3g} solutions/s")
+
+    # nœuds estimés par profondeur (log10)
+    L = max(len(c['nodes_per_depth']) for c in configs) - 1
+    print(f"\n{'profondeur':<12}" + "".join(f"{c['order'][:8] + (' *' if c['schedule'] else ''):>11}"
+                                          for c in configs))
+    for depth in sorted(set(range(0, L + 1, args.every)) | {L}):
+        row = "".join(f"{log10(c['nodes_per_depth'][depth]) if depth < len(c['nodes_per_depth']) else '':>11}"
+                      for c in configs)
+        print(f"{depth:<12}{row}")
+
+    report = {
+        'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'commit': git_commit(),
+        'conf': args.conf,
+        'hints': args.hints or None,
+        'probes': args.probes,
+        'seed': args.seed,
+        'rate_time': args.rate_time,
+        'configs': configs,
+    }
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"-> {out}")
@@ -0,0 +1,321 @@
+import argparse
+import ast
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+from numba.core.dispatcher import Dispatcher
+
+from bench_kernels import ROOT, git_commit
+
+# Benchmark statistique d'une configuration du recuit : la même
+# configuration est lancée sur de nombreuses graines avec un budget de temps
+# par run, et on enregistre pour chaque seuil de score le temps (et le
+# nombre de pas) nécessaire pour l'atteindre, ainsi que le score final.
+#
+#   python benchmarks/time_to_target.py -runs 32 -budget 60 -targets 440 460 480 -out base.json
+#   python benchmarks/time_to_target.py -runs 32 -budget 60 -targets 440 460 480 -set ALPHA=0.9999 -out alpha.json
+#   python benchmarks/time_to_target.py -compare base.json alpha.json
+#
+# Les graines des runs sont tirées d'une np.random.SeedSequence(-seed) :
+# mêmes -seed et -runs, mêmes graines. Les scores sont ceux du solveur
+# (arêtes intérieures + bonus de bord), les paramètres modifiables étant
+# les globales de s_a.py (-set NOM=VALEUR, VALEUR en syntaxe Python) que
+# les noyaux numba ne lisent pas directement.
+# Seul le recuit à chaînes indépendantes est mesuré, pas le parallel
+# tempering.
+#
+# La comparaison utilise un test du log-rank sur les temps d'atteinte de
+# chaque seuil (les runs qui ne l'atteignent pas dans le budget étant
+# censurés) et un test de Mann-Whitney sur les scores finaux.
+
+# Module du solveur et instance, fixés par init_worker dans chaque processus
+s_a = None
+puzzle = None
+
+
+def parse_overrides(items):
+    overrides = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        try:
+            overrides[name] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            raise SystemExit(f"-set {item}: valeur Python attendue")
+    return overrides
+
+
+def kernel_globals(module):
+    # Globales lues par les noyaux numba du module : numba en fige la valeur
+    # à la compilation (puis la relit du cache), un -set n'aurait aucun effet
+    names = set()
+    for obj in vars(module).values():
+        if isinstance(obj, Dispatcher):
+            names.update(obj.py_func.__code__.co_names)
+    return names
+
+
+def init_worker(conf, hints, overrides):
+    global s_a, puzzle
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    import s_a as module
+    frozen = kernel_globals(module)
+    for name, value in overrides.items():
+        if not name.isupper() or not hasattr(module, name):
+            raise SystemExit(f"-set {name}: paramètre inconnu de s_a.py")
+        if name in frozen:
+            raise SystemExit(f"-set {name}: lu par un noyau numba, figé à la compilation")
+        setattr(module, name, value)
+    s_a = module
+    puzzle = s_a.Puzzle(conf, hints)
+
+
+def run_seeds(master_seed, runs):
+    children = np.random.SeedSequence(master_seed).spawn(runs)
+    return [int(c.generate_state(1, dtype=np.uint32)[0]) for c in children]
+
+
+def run_one(task):
+    # Un run du recuit depuis le plateau initial du solveur (cadre parfait
+    # avec -set RING_START=True) ; rend le score
+    # final et, pour chaque seuil atteint, (secondes, pas) au premier passage
+    seed, budget, max_steps, targets = task
+    np.random.seed(seed)
+    s_a.seed_numba(seed)
+    board_p, board_r = s_a.ring_board(puzzle) if s_a.RING_START else s_a.initial_board(puzzle)
+    best_p, best_r = board_p.copy(), board_r.copy()
+    move_tables = s_a.chain_move_tables(puzzle, None)
+    max_score = s_a.max_possible_score(puzzle)
+    state = np.zeros(s_a.N_STATE, dtype=np.int64)
+    state[s_a.ST_SCORE] = state[s_a.ST_BEST] = s_a.score_numba(board_p, board_r, puzzle.t_rot, puzzle.border_w)
+    T = s_a.T0
+
+    hits = {}
+    start = time.perf_counter()
+    elapsed = 0.0
+    while True:
+        best = int(state[s_a.ST_BEST])
+        for target in targets:
+            if target not in hits and best >= target:
+                hits[target] = (elapsed, int(state[s_a.ST_STEP]))
+        steps_left = max_steps - int(state[s_a.ST_STEP]) if max_steps else s_a.STEPS_PER_BATCH
+        if elapsed >= budget or steps_left <= 0 or best == max_score:
+            break
+        T, _ = s_a.anneal_batch_numba(board_p, board_r, best_p, best_r, *puzzle.tables, *move_tables,
+                                      state, T, min(s_a.STEPS_PER_BATCH, steps_left), s_a.ALPHA, s_a.T_MIN,
+                                      s_a.MAX_STEPS_WITHOUT_IMPROV, s_a.BOOST_MAX, s_a.BOOST_MIN, max_score,
+                                      s_a.EXP_TABLE_SIZE, s_a.EXP_TABLE_REFRESH)
+        elapsed = time.perf_counter() - start
+
+    return {
+        'seed': seed,
+        'final': int(state[s_a.ST_BEST]),
+        'steps': int(state[s_a.ST_STEP]),
+        'elapsed': elapsed,
+        'hits': {str(t): list(hits[t]) if t in hits else None for t in targets},
+    }
+
+
+# ==============================
+# Statistiques (sans scipy)
+# ==============================
+def normal_sf(z):
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def kaplan_meier(times, events):
+    # courbe (t, fraction des runs ayant atteint le seuil) et temps médian,
+    # None si moins de la moitié des runs l'atteignent
+    order = sorted(zip(times, events))
+    n = len(order)
+    survival, curve, median = 1.0, [], None
+    k = 0
+    while k < n:
+        t = order[k][0]
+        d = sum(1 for tt, e in order if tt == t and e)
+        at_risk = n - k
+        k += sum(1 for tt, _ in order if tt == t)
+        if d:
+            survival *= 1 - d / at_risk
+            curve.append((t, 1 - survival))
+            if median is None and survival <= 0.5:
+                median = t
+    return curve, median
+
+
+def log_rank(times_a, events_a, times_b, events_b):
+    # statistique du chi2 à 1 degré de liberté et p-value bilatérale ;
+    # a plus rapide que b si observed_a > expected_a
+    data = [(t, e, 0) for t, e in zip(times_a, events_a)] + [(t, e, 1) for t, e in zip(times_b, events_b)]
+    event_times = sorted({t for t, e, _ in data if e})
+    observed = expected = variance = 0.0
+    for t in event_times:
+        n_a = sum(1 for tt, _, g in data if tt >= t and g == 0)
+        n = sum(1 for tt, _, _ in data if tt >= t)
+        d_a = sum(1 for tt, e, g in data if tt == t and e and g == 0)
+        d = sum(1 for tt, e, _ in data if tt == t and e)
+        observed += d_a
+        expected += d * n_a / n
+        if n > 1:
+            variance += d * (n_a / n) * (1 - n_a / n) * (n - d) / (n - 1)
+    if variance == 0:
+        return {'chi2': 0.0, 'p': 1.0, 'observed_a': observed, 'expected_a': expected}
+    chi2 = (observed - expected) ** 2 / variance
+    return {'chi2': chi2, 'p': math.erfc(math.sqrt(chi2 / 2)), 'observed_a': observed, 'expected_a': expected}
+
+
+def mann_whitney(a, b):
+    # U de a, p-value bilatérale (approximation normale avec correction des
+    # ex-aequo et de continuité) et P(a > b) + P(a = b)/2
+    values = sorted((v, g) for g, xs in enumerate((a, b)) for v in xs)
+    ranks = {}
+    ties = 0.0
+    k = 0
+    while k < len(values):
+        m = k
+        while m < len(values) and values[m][0] == values[k][0]:
+            m += 1
+        ranks[values[k][0]] = (k + m + 1) / 2
+        ties += (m - k) ** 3 - (m - k)
+        k = m
+    n1, n2 = len(a), len(b)
+    u = sum(ranks[v] for v in a) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    mean = n1 * n2 / 2
+    var = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))) if n > 1 else 0.0
+    if var <= 0:
+        return {'u': u, 'p': 1.0, 'prob_a_greater': 0.5}
+    z = (abs(u - mean) - 0.5) / math.sqrt(var)
+    return {'u': u, 'p': min(1.0, 2 * normal_sf(max(z, 0.0))), 'prob_a_greater': u / (n1 * n2)}
+
+
+def target_times(runs, target, axis):
+    # temps d'atteinte (ou durée du run, censuré) et indicateur d'événement
+    column = 0 if axis == "time" else 1
+    times, events = [], []
+    for run in runs:
+        hit = run['hits'][str(target)]
+        if hit is None:
+            times.append(run['elapsed'] if axis == "time" else run['steps'])
+            events.append(False)
+        else:
+            times.append(hit[column])
+            events.append(True)
+    return times, events
+
+
+def summarize(report):
+    runs = report['runs']
+    finals = [r['final'] for r in runs]
+    summary = {'final': {'min': min(finals), 'median': float(np.median(finals)),
+                         'mean': float(np.mean(finals)), 'max': max(finals)}, 'targets': {}}
+    for target in report['targets']:
+        entry = {'reached': sum(r['hits'][str(target)] is not None for r in runs)}
+        for axis in ("time", "steps"):
+            curve, median = kaplan_meier(*target_times(runs, target, axis))
+            entry[f'median_{axis}'] = median
+            entry[f'curve_{axis}'] = curve
+        summary['targets'][str(target)] = entry
+    return summary
+
+
+def fmt(value):
+    return "-" if value is None else f"{value:.4g}"
+
+
+def compare(a, b, axis):
+    name_a, name_b = a['label'], b['label']
+    print(f"A = {name_a} ({len(a['runs'])} runs)   B = {name_b} ({len(b['runs'])} runs)")
+    if a['conf'] != b['conf'] or a['budget'] != b['budget']:
+        print("[WARNING] puzzles ou budgets différents")
+    mw = mann_whitney([r['final'] for r in a['runs']], [r['final'] for r in b['runs']])
+    print(f"score final : médianes {a['summary']['final']['median']:.1f} / {b['summary']['final']['median']:.1f}"
+          f"  P(A>B)={mw['prob_a_greater']:.2f}  Mann-Whitney p={mw['p']:.4f}")
+    results = {'final': mw, 'targets': {}}
+    for target in sorted(set(a['targets']) & set(b['targets'])):
+        ta = a['summary']['targets'][str(target)]
+        tb = b['summary']['targets'][str(target)]
+        lr = log_rank(*target_times(a['runs'], target, axis), *target_times(b['runs'], target, axis))
+        results['targets'][str(target)] = lr
+        faster = "A" if lr['observed_a'] > lr['expected_a'] else "B"
+        print(f"seuil {target} : atteint {ta['reached']}/{len(a['runs'])} / {tb['reached']}/{len(b['runs'])}"
+              f"  médiane ({axis}) {fmt(ta[f'median_{axis}'])} / {fmt(tb[f'median_{axis}'])}"
+              f"  log-rank p={lr['p']:.4f} ({faster} plus rapide)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-conf", default="data/eternity2/eternity2_256_1.csv")
+    parser.add_argument("-hints", default="data/eternity2/eternity2_256_hints.csv")
+    parser.add_argument("-runs", type=int, default=16)
+    parser.add_argument("-seed", type=int, default=0, help="Master seed the run seeds are drawn from")
+    parser.add_argument("-budget", type=float, default=60.0, help="Wall-clock seconds per run")
+    parser.add_argument("-steps", type=int, default=0, help="Optional step budget per run (reproducible)")
+    parser.add_argument("-targets", type=int, nargs="+", default=[])
+    parser.add_argument("-set", dest="overrides", action="append", default=[],
+                        help="s_a.py parameter override NAME=VALUE, repeatable")
+    parser.add_argument("-label", default=None)
+    parser.add_argument("-jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("-out", default="time_to_target.json")
+    parser.add_argument("-compare", nargs=2, default=None, metavar=("A", "B"),
+                        help="Compare two result files instead of running")
+    parser.add_argument("-axis", choices=("time", "steps"), default="time",
+                        help="Time-to-target measured in seconds or in annealing steps")
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path) as f:
+                reports.append(json.load(f))
+        compare(*reports, args.axis)
+        raise SystemExit(0)
+
+    if not args.targets:
+        parser.error("-targets is required")
+    out = os.path.abspath(args.out)
+    overrides = parse_overrides(args.overrides)
+    hints = args.hints or None
+    init_worker(args.conf, hints, overrides)
+    # compilé avant les runs, hérité par les workers : le temps JIT n'entre
+    # pas dans les mesures
+    jit_time = s_a.warmup(puzzle)
+
+    seeds = run_seeds(args.seed, args.runs)
+    tasks = [(seed, args.budget, args.steps, sorted(args.targets)) for seed in seeds]
+    print(f"{len(tasks)} runs de {args.budget:.0f}s, {args.jobs} en parallèle, JIT {jit_time:.1f}s")
+    with multiprocessing.Pool(args.jobs, initializer=init_worker, initargs=(args.conf, hints, overrides)) as pool:
+        runs = []
+        for run in pool.imap(run_one, tasks):
+            runs.append(run)
+            print(f"  seed {run['seed']:>10}  score {run['final']}  {run['steps']} pas")
+
+    report = {
+        'label': args.label or (" ".join(args.overrides) or "defaults"),
+        'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'commit': git_commit(),
+        'cpus': os.cpu_count(),
+        'jobs': args.jobs,
+        'conf': args.conf,
+        'hints': hints,
+        'overrides': overrides,
+        'master_seed': args.seed,
+        'budget': args.budget,
+        'max_steps': args.steps,
+        'targets': sorted(args.targets),
+        'runs': runs,
+    }
+    report['summary'] = summarize(report)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for target, entry in report['summary']['targets'].items():
+        print(f"seuil {target} : {entry['reached']}/{len(runs)} runs, médiane {fmt(entry['median_time'])} s")
+    print(f"-> {out}")
@@ -0,0 +1,143 @@
+import json
+import os
+
+# Append-only progress log, one JSON object per line. Writers only ever
+# append a complete line with a single write, so readers never need to parse
+# more than what was added since they last looked. When the file grows past
+# max_bytes it is renamed to <path>.1 (older backups shift to .2, .3, ...)
+# and a fresh file is started.
+#
+# Readers keep a cursor (inode, offset): the identity of the file they were
+# reading and the byte offset just after the last complete line they saw.
+# A cursor stays valid across rotations as long as the file it points to is
+# still one of the backups; the backups rotated in after it are read too.
+# Readers need the writer's backup count to find them: use a ProgressLog
+# configured like the writer's, or pass backups to read_since.
+
+BACKUPS = 3
+
+
+class ProgressLog:
+    def __init__(self, path, max_bytes=1 << 20, backups=BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def append(self, entry):
+        # writers from several processes must be serialised by the caller
+        # for the rotation to be safe, the appends themselves are atomic
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        for k in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{k}"):
+                os.replace(f"{self.path}.{k}", f"{self.path}.{k + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def read_since(self, cursor=None):
+        return read_since(self.path, cursor, self.backups)
+
+    def read_last(self, n):
+        return read_last(self.path, n)
+
+
+def _parse(chunk):
+    # complete lines of chunk and the number of bytes they span
+    end = chunk.rfind(b"\n") + 1
+    entries = []
+    for line in chunk[:end].splitlines():
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries, end
+
+
+def _read_tail(path, offset):
+    try:
+        with open(path, "rb") as f:
+            inode = os.fstat(f.fileno()).st_ino
+            f.seek(offset)
+            entries, used = _parse(f.read())
+    except OSError:
+        return [], None
+    return entries, (inode, offset + used)
+
+
+def _backup(path, k):
+    return path if k == 0 else f"{path}.{k}"
+
+
+def _find_inode(path, inode, backups):
+    # k such that _backup(path, k) is the file inode, None once it was dropped
+    for k in range(backups + 1):
+        try:
+            if os.stat(_backup(path, k)).st_ino == inode:
+                return k
+        except OSError:
+            continue
+    return None
+
+
+def read_since(path, cursor=None, backups=BACKUPS):
+    # entries appended after cursor and the cursor to pass next time;
+    # with cursor None the whole current file is read. backups must be the
+    # writer's backup count.
+    try:
+        current = os.stat(path).st_ino
+    except OSError:
+        return [], cursor
+
+    entries = []
+    if cursor is not None:
+        inode, offset = cursor
+        if inode == current:
+            if os.stat(path).st_size < offset:
+                offset = 0  # truncated in place
+            return _read_tail(path, offset)
+        # rotated since last read: finish the cursor's file, then every
+        # backup rotated in after it, oldest first. If the cursor's file was
+        # dropped, all the backups left are newer than it.
+        k = _find_inode(path, inode, backups)
+        if k is None:
+            k, offset = backups + 1, 0
+        for j in range(k, 0, -1):
+            more, _ = _read_tail(_backup(path, j), offset if j == k else 0)
+            entries += more
+    more, cursor = _read_tail(path, 0)
+    return entries + more, cursor
+
+
+def read_last(path, n, block=8192):
+    # last n entries of the current file, reading it backwards from the end,
+    # and the cursor just after them
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return [], None
+    with f:
+        st = os.fstat(f.fileno())
+        end = st.st_size
+        # only complete lines count, a line being written is left for later
+        pos = end
+        data = b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+        if pos > 0:
+            data = data[data.index(b"\n") + 1:]
+        entries, used = _parse(data)
+        return entries[-n:], (st.st_ino, end - len(data) + used)
@@ -0,0 +1,205 @@
+import os
+import sys
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+# Fixed-layout shared memory block describing the solver state. The solver
+# creates it, every chain writes into it and any other process (dashboard,
+# metrics) can map it read-only without talking to the solver.
+#
+#   header | chains[num_chains] | best_p[height*width] | best_r[height*width]
+#
+# The best-board part is guarded by a seqlock: writers (serialised by a lock
+# shared between chains) make seq odd while writing and even again when done,
+# readers retry until they see the same even value before and after copying,
+# and give up after READ_ATTEMPTS tries (a writer killed mid-update leaves seq
+# odd for good). Each chain row has a single writer, its own chain.
+#
+# The header records the creator's pid: a block left by a dead solver is
+# replaced, one owned by a live solver is not.
+
+STATUS_NAME = "edgepuzzle_status"
+MAGIC = 0x45325354
+VERSION = 3
+READ_ATTEMPTS = 1000
+READ_RETRY_DELAY = 0.001
+
+HEADER_DTYPE = np.dtype([
+    ('magic', '<u4'),
+    ('version', '<u4'),
+    ('seq', '<u8'),
+    ('height', '<i4'),
+    ('width', '<i4'),
+    ('num_chains', '<i4'),
+    ('pid', '<i4'),
+    ('start_time', '<f8'),
+    ('best_score', '<i8'),
+    ('best_seed', '<i8'),
+    ('best_step', '<i8'),
+    ('best_time', '<f8'),
+])
+
+CHAIN_DTYPE = np.dtype([
+    ('steps', '<i8'),
+    ('score', '<i8'),
+    ('best', '<i8'),
+    ('temperature', '<f8'),
+    ('boosts', '<i8'),
+    ('last_improvement', '<f8'),
+    ('updated', '<f8'),
+    ('accepted', '<i8'),
+    ('steps_per_sec', '<f8'),
+    ('acceptance', '<f8'),
+])
+
+
+def block_size(height, width, num_chains):
+    return HEADER_DTYPE.itemsize + num_chains * CHAIN_DTYPE.itemsize + 2 * 2 * height * width
+
+
+def owner_pid(name):
+    # pid of the solver that created an existing block, None if unreadable
+    try:
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, "shared_memory")
+    except FileNotFoundError:
+        return None
+    try:
+        if shm.size < HEADER_DTYPE.itemsize:
+            return None
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+        pid = int(header['pid']) if header['magic'] == MAGIC and header['version'] == VERSION else 0
+        del header
+        return pid or None
+    finally:
+        shm.close()
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class StatusBlock:
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+        if self.header['magic'] != MAGIC or self.header['version'] != VERSION:
+            raise ValueError(f"{shm.name} is not a solver status block (version {VERSION})")
+        self.height = int(self.header['height'])
+        self.width = int(self.header['width'])
+        self.num_chains = int(self.header['num_chains'])
+
+        off = HEADER_DTYPE.itemsize
+        self.chains = np.ndarray((self.num_chains,), dtype=CHAIN_DTYPE, buffer=shm.buf, offset=off)
+        off += self.chains.nbytes
+        self.best_p = np.ndarray((self.height, self.width), dtype=np.int16, buffer=shm.buf, offset=off)
+        off += self.best_p.nbytes
+        self.best_r = np.ndarray((self.height, self.width), dtype=np.int16, buffer=shm.buf, offset=off)
+
+    @classmethod
+    def create(cls, height, width, num_chains, name=STATUS_NAME):
+        size = block_size(height, width, num_chains)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            pid = owner_pid(name)
+            if pid is not None and pid_alive(pid):
+                raise RuntimeError(f"{name} is in use by a running solver (pid {pid})") from None
+            # left over by a solver that was killed before cleaning up
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+        header[...] = 0
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['height'] = height
+        header['width'] = width
+        header['num_chains'] = num_chains
+        header['pid'] = os.getpid()
+        header['start_time'] = time.time()
+        header['best_score'] = -1
+        header['best_seed'] = -1
+        del header
+
+        block = cls(shm, owner=True)
+        block.chains[...] = 0
+        block.best_p[...] = 0
+        block.best_r[...] = 0
+        return block
+
+    @classmethod
+    def attach(cls, name=STATUS_NAME, forked=False):
+        # forked: the caller is a child of the creator and shares its
+        # resource tracker, which must keep its registration of the block
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+            if not forked:
+                # only the creator may unlink the block
+                resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    def try_update_best(self, lock, score, seed, step, elapsed, board_p, board_r):
+        # returns True when score beats the current global best
+        with lock:
+            if score <= self.header['best_score']:
+                return False
+            self.header['seq'] += 1
+            self.header['best_score'] = score
+            self.header['best_seed'] = seed
+            self.header['best_step'] = step
+            self.header['best_time'] = elapsed
+            self.best_p[...] = board_p
+            self.best_r[...] = board_r
+            self.header['seq'] += 1
+            return True
+
+    def read_best(self, with_board=False):
+        for attempt in range(READ_ATTEMPTS):
+            if attempt:
+                time.sleep(READ_RETRY_DELAY)
+            seq = int(self.header['seq'])
+            if seq % 2:
+                continue
+            best = {
+                'score': int(self.header['best_score']),
+                'seed': int(self.header['best_seed']),
+                'step': int(self.header['best_step']),
+                'time': float(self.header['best_time']),
+            }
+            if with_board:
+                best['board_p'] = self.best_p.copy()
+                best['board_r'] = self.best_r.copy()
+            if int(self.header['seq']) == seq:
+                return best
+        raise TimeoutError(f"{self.shm.name}: best board still being written after "
+                           f"{READ_ATTEMPTS * READ_RETRY_DELAY:.0f}s, writer killed mid-update?")
+
+    def update_chain(self, chain, **fields):
+        for key, value in fields.items():
+            self.chains[key][chain] = value
+        self.chains['updated'][chain] = time.time()
+
+    def read_chains(self):
+        return self.chains.copy()
+
+    def close(self):
+        del self.header, self.chains, self.best_p, self.best_r
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
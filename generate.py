@@ -1,24 +1,29 @@
 import argparse
+import glob
+import multiprocessing
 import os
-import pygame
+import sys
+import time
+from PIL import Image
 from core.defs import PuzzleDefinition, TYPE_CORNER, TYPE_EDGE
 from core import board as board_module
-from ui.headless import BoardUi
+from ui.patterns import PATTERN_DIR
+from ui.render import BoardRenderer, board_arrays
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("-conf", required=True)
-    parser.add_argument("-hints", default=None)
-    parser.add_argument("-load", default=None)
-    args = parser.parse_args()
+IMG_DIR = "img"
+
+# Renderer partagé par les workers du mode batch (hérité au fork)
+renderer = None
 
+
+def build_board(conf, hints=None, load=None):
     puzzle_def = PuzzleDefinition()
-    puzzle_def.load(args.conf, args.hints)
+    puzzle_def.load(conf, hints)
 
     board = board_module.Board(puzzle_def)
 
-    if args.load:
-        board.load(args.load)
+    if load:
+        board.load(load)
         for id in range(1, puzzle_def.width*puzzle_def.height+1):
             if id not in board.board_by_id:
                 piece = board.puzzle_def.all[id]
@@ -36,21 +41,150 @@ if __name__ == "__main__":
     else:
         board.randomize()
         board.heuristic_orientation()
+    return board
+
 
-    # Marque les pièces
-    for i in range(puzzle_def.height):
-        for j in range(puzzle_def.width):
-            if board.board[i][j]:
-                board.marks[i][j] = board.board[i][j].piece_def.id
+def read_solution(puzzle_def, path):
+    # Plateau tel qu'écrit par le solveur (i,j,id,orientation), sans
+    # réorientation heuristique
+    board = board_module.Board(puzzle_def)
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                i, j, piece_id, orientation = (int(x) for x in line.strip().split(","))
+                board.put_piece(i, j, puzzle_def.all[piece_id], orientation)
+    return board
+
+
+def image_paths(score):
+    return (os.path.join(IMG_DIR, f"partial_solution_{score}_with_marks.jpg"),
+            os.path.join(IMG_DIR, f"partial_solution_{score}_without_marks.jpg"))
 
-    # Initialisation UI
-    ui = BoardUi(board)
-    ui.init()
 
-    # Sauvegarde images
+def save_images(renderer, board):
+    # Rendu NumPy, sans pygame ; les marques sont les numéros des pièces
+    ids, dirs = board_arrays(board)
     score = board.evaluate()
-    os.makedirs("img", exist_ok=True)
-    ui.save(f"img/partial_solution_{score}_with_marks.jpg", marks=True)
-    ui.save(f"img/partial_solution_{score}_without_marks.jpg", marks=False)
+    with_marks, without_marks = image_paths(score)
+    renderer.save(with_marks, ids, dirs, marks=True)
+    renderer.save(without_marks, ids, dirs, marks=False)
+    return score
+
+
+def sources_mtime(conf):
+    # Une image est périmée si la définition ou un motif est plus récent
+    paths = [conf] + glob.glob(os.path.join(PATTERN_DIR, "pattern*.png"))
+    return max(os.path.getmtime(p) for p in paths)
+
+
+def up_to_date(paths, mtime, size):
+    for path in paths:
+        if not os.path.exists(path) or os.path.getmtime(path) < mtime:
+            return False
+        try:
+            with Image.open(path) as img:  # lit seulement l'en-tête
+                if img.size != size:
+                    return False
+        except OSError:
+            return False
+    return True
+
+
+def init_worker(conf):
+    global renderer
+    if renderer is None:  # spawn : pas de renderer hérité
+        puzzle_def = PuzzleDefinition()
+        puzzle_def.load(conf)
+        renderer = BoardRenderer(puzzle_def)
+
+
+def render_file(task):
+    # (fichier, statut) : rendu si une image manque ou est périmée
+    path, base_mtime, force = task
+    try:
+        board = read_solution(renderer.puzzle_def, path)
+        paths = image_paths(board.evaluate())
+        size = (renderer.piece_width * renderer.width, renderer.piece_width * renderer.height)
+        mtime = max(base_mtime, os.path.getmtime(path))
+        if not force and up_to_date(paths, mtime, size):
+            return path, "up to date"
+        return path, f"score {save_images(renderer, board)}"
+    except (OSError, ValueError, KeyError) as e:
+        return path, f"failed ({e})"
+
+
+def expand(patterns):
+    # Fichiers CSV désignés par des motifs glob, "-" lisant les noms sur stdin
+    files = []
+    for pattern in patterns:
+        if pattern == "-":
+            files.extend(line.strip() for line in sys.stdin if line.strip())
+        else:
+            files.extend(sorted(glob.glob(pattern)) or [pattern])
+    return list(dict.fromkeys(files))
+
+
+def csv_mtimes(directory):
+    # mtime des CSV du dossier ; un fichier supprimé ou renommé entre le
+    # glob et le stat est simplement ignoré
+    mtimes = {}
+    for f in glob.glob(os.path.join(directory, "*.csv")):
+        try:
+            mtimes[f] = os.path.getmtime(f)
+        except OSError:
+            continue
+    return mtimes
+
+
+def render_batch(pool, conf, files, force):
+    base_mtime = sources_mtime(conf)
+    tasks = [(f, base_mtime, force) for f in files]
+    rendered = 0
+    for path, status in pool.imap_unordered(render_file, tasks):
+        if status != "up to date":
+            rendered += 1
+            print(f"{path}: {status}")
+    return rendered
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-conf", required=True)
+    parser.add_argument("-hints", default=None)
+    parser.add_argument("-load", default=None)
+    parser.add_argument("-batch", nargs="+", default=None,
+                        help="Solution CSVs or glob patterns to render, - reads file names from stdin")
+    parser.add_argument("-watch", default=None,
+                        help="Directory polled for new or modified solution CSVs")
+    parser.add_argument("-interval", type=float, default=2.0, help="Polling period of -watch, in seconds")
+    parser.add_argument("-jobs", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("-force", action="store_true", help="Render even up-to-date images")
+    args = parser.parse_args()
+
+    if args.batch is None and args.watch is None:
+        board = build_board(args.conf, args.hints, args.load)
+        os.makedirs(IMG_DIR, exist_ok=True)
+        save_images(BoardRenderer(board.puzzle_def), board)
+        raise SystemExit(0)
+
+    # Un seul renderer initialisé, partagé par les workers
+    init_worker(args.conf)
+    os.makedirs(IMG_DIR, exist_ok=True)
+    with multiprocessing.Pool(args.jobs, initializer=init_worker, initargs=(args.conf,)) as pool:
+        if args.batch is not None:
+            start = time.time()
+            files = expand(args.batch)
+            rendered = render_batch(pool, args.conf, files, args.force)
+            print(f"{rendered}/{len(files)} rendered in {time.time() - start:.1f}s")
 
-    pygame.quit()
+        if args.watch is not None:
+            # un fichier lu en cours d'écriture change encore de mtime
+            # ensuite et sera donc repris
+            seen = {}
+            while True:
+                mtimes = csv_mtimes(args.watch)
+                changed = [f for f, m in mtimes.items() if seen.get(f) != m]
+                if changed:
+                    render_batch(pool, args.conf, changed, args.force)
+                seen = mtimes
+                time.sleep(args.interval)
@@ -0,0 +1,205 @@
+import argparse
+import time
+import numpy as np
+from numba import njit
+
+# ==============================
+# Solveur exact du cadre
+# ==============================
+# Les pièces de bord forment un anneau de 2*(H+W)-4 cases parcouru dans le
+# sens horaire depuis le coin (0,0) : ligne du haut, colonne de droite,
+# ligne du bas puis colonne de gauche. Le côté gris d'une pièce de bord
+# (les deux pour un coin) est tourné vers l'extérieur, ce qui fixe sa
+# rotation : il ne reste que la couleur d'entrée (côté de la case
+# précédente) et la couleur de sortie (côté de la case suivante), propres à
+# la pièce. Un cadre parfait est une suite cyclique de pièces où la sortie de
+# chacune est l'entrée de la suivante, les coins tombant aux angles.
+#
+# La recherche est un retour arrière en profondeur compilé ; l'ordre des
+# candidats est une permutation tirée de la graine, de sorte que chaque
+# graine donne un cadre différent.
+
+CLS_CORNER = 0
+CLS_EDGE = 1
+
+def ring_cells(height, width):
+    # cases de l'anneau dans l'ordre de parcours et directions (N, E, S, O)
+    # tournées vers l'extérieur
+    cells = [(0, j) for j in range(width)]
+    cells += [(i, width-1) for i in range(1, height)]
+    cells += [(height-1, j) for j in range(width-2, -1, -1)]
+    cells += [(i, 0) for i in range(height-2, 0, -1)]
+    outward = []
+    for i, j in cells:
+        outward.append([d for d, out in enumerate((i == 0, j == width-1, i == height-1, j == 0)) if out])
+    return cells, outward
+
+def piece_ends(tiles, p):
+    # (classe, couleur d'entrée, couleur de sortie) d'une pièce de bord, None
+    # pour une pièce intérieure ; tiles dans l'ordre N, E, S, O, gris = -1
+    t = tiles[p]
+    greys = [d for d in range(4) if t[d] == -1]
+    if len(greys) == 1:
+        g = greys[0]
+        return CLS_EDGE, int(t[(g+3) % 4]), int(t[(g+1) % 4])
+    if len(greys) == 2:
+        g = greys[0] if (greys[0]+1) % 4 == greys[1] else greys[1]
+        return CLS_CORNER, int(t[(g+3) % 4]), int(t[(g+2) % 4])
+    return None
+
+def outward_rotation(tiles, p, outward):
+    # rotation r (convention de s_a : côté d = tiles[p][(d+r)%4]) qui tourne
+    # les côtés gris de p vers l'extérieur
+    for r in range(4):
+        if all(tiles[p][(d+r) % 4] == -1 for d in outward) and \
+                sum(tiles[p][(d+r) % 4] == -1 for d in range(4)) == len(outward):
+            return r
+    return -1
+
+class RingSolver:
+    # Tables de la recherche pour une instance (tiles, hauteur, largeur et
+    # cases fixes au format de s_a.Puzzle)
+    def __init__(self, puzzle):
+        self.puzzle = puzzle
+        self.cells, self.outward = ring_cells(puzzle.height, puzzle.width)
+        L = len(self.cells)
+        self.ring_class = np.array([CLS_CORNER if len(o) == 2 else CLS_EDGE for o in self.outward], dtype=np.int64)
+
+        self.pieces = [p for p in range(len(puzzle.tiles)) if piece_ends(puzzle.tiles, p) is not None]
+        ends = {p: piece_ends(puzzle.tiles, p) for p in self.pieces}
+        self.n_colors = max([c for _, a, b in ends.values() for c in (a, b)] + [0]) + 1
+        self.piece_class = np.full(len(puzzle.tiles), -1, dtype=np.int64)
+        self.piece_in = np.zeros(len(puzzle.tiles), dtype=np.int64)
+        self.piece_out = np.zeros(len(puzzle.tiles), dtype=np.int64)
+        for p, (k, a, b) in ends.items():
+            self.piece_class[p], self.piece_in[p], self.piece_out[p] = k, a, b
+
+        # pièce imposée sur l'anneau (-1 sinon)
+        self.ring_fixed = np.full(L, -1, dtype=np.int64)
+        for pos, (i, j) in enumerate(self.cells):
+            if puzzle.fixed[i, j]:
+                self.ring_fixed[pos] = puzzle.fixed_p[i, j]
+
+    def candidates(self, rng):
+        # cand[lo:hi], (lo, hi) = bounds[k, c] : pièces de classe k d'entrée c
+        # dans l'ordre de la permutation ; la couleur n_colors regroupe toute
+        # la classe (première case de l'anneau)
+        order = rng.permutation(self.pieces)
+        fixed = set(self.ring_fixed[self.ring_fixed >= 0].tolist())
+        n = self.n_colors + 1
+        groups = [[[] for _ in range(n)] for _ in (CLS_CORNER, CLS_EDGE)]
+        for p in order:
+            if p in fixed:
+                continue
+            k = self.piece_class[p]
+            groups[k][self.piece_in[p]].append(p)
+            groups[k][self.n_colors].append(p)
+        bounds = np.zeros((2, n, 2), dtype=np.int64)
+        cand = []
+        for k in (CLS_CORNER, CLS_EDGE):
+            for c in range(n):
+                bounds[k, c] = (len(cand), len(cand) + len(groups[k][c]))
+                cand.extend(groups[k][c])
+        return bounds, np.array(cand, dtype=np.int64)
+
+    def solve(self, seed, max_nodes=1_000_000):
+        # (board_p, board_r) des cases de l'anneau, dans l'ordre de
+        # self.cells, ou None si la recherche dépasse max_nodes
+        rng = np.random.default_rng(seed)
+        bounds, cand = self.candidates(rng)
+        ring_p = np.zeros(len(self.cells), dtype=np.int64)
+        nodes = solve_ring_numba(self.ring_class, self.ring_fixed, self.piece_in, self.piece_out,
+                                 bounds, cand, self.n_colors, max_nodes, ring_p)
+        if nodes < 0:
+            return None
+        ring_r = np.array([outward_rotation(self.puzzle.tiles, p, o) for p, o in zip(ring_p, self.outward)],
+                          dtype=np.int64)
+        return ring_p, ring_r
+
+    def place(self, board_p, board_r, ring):
+        ring_p, ring_r = ring
+        for (i, j), p, r in zip(self.cells, ring_p, ring_r):
+            board_p[i, j] = p
+            board_r[i, j] = r
+
+@njit(cache=True)
+def solve_ring_numba(ring_class, ring_fixed, piece_in, piece_out, bounds, cand, n_colors, max_nodes, ring_p):
+    # Retour arrière itératif : ptr[k] est le prochain candidat à essayer en
+    # case k. Retourne le nombre de nœuds visités, -1 au-delà de max_nodes.
+    L = ring_class.shape[0]
+    used = np.zeros(piece_in.shape[0], dtype=np.bool_)
+    ptr = np.zeros(L, dtype=np.int64)
+    end = np.zeros(L, dtype=np.int64)
+    nodes = 0
+
+    k = 0
+    # case 0 : toute pièce de sa classe, ou la pièce imposée
+    ptr[0] = 0 if ring_fixed[0] >= 0 else bounds[ring_class[0], n_colors, 0]
+    end[0] = bounds[ring_class[0], n_colors, 1]
+    while k >= 0:
+        placed = False
+        if ring_fixed[k] >= 0:
+            # une seule possibilité, essayée une fois
+            if ptr[k] == 0:
+                ptr[k] = 1
+                p = ring_fixed[k]
+                if k == 0 or piece_in[p] == piece_out[ring_p[k-1]]:
+                    ring_p[k] = p
+                    placed = True
+        else:
+            while ptr[k] < end[k]:
+                p = cand[ptr[k]]
+                ptr[k] += 1
+                if used[p]:
+                    continue
+                ring_p[k] = p
+                placed = True
+                break
+
+        if placed:
+            nodes += 1
+            if nodes > max_nodes:
+                return -1
+            used[ring_p[k]] = True
+            if k == L-1:
+                # fermeture de l'anneau
+                if piece_out[ring_p[k]] == piece_in[ring_p[0]]:
+                    return nodes
+                used[ring_p[k]] = False
+                continue
+            k += 1
+            if ring_fixed[k] >= 0:
+                ptr[k] = 0
+            else:
+                c = piece_out[ring_p[k-1]]
+                ptr[k] = bounds[ring_class[k], c, 0]
+                end[k] = bounds[ring_class[k], c, 1]
+        else:
+            k -= 1
+            if k >= 0:
+                used[ring_p[k]] = False
+    return -1
+
+if __name__ == "__main__":
+    from s_a import Puzzle, PUZZLE_CONF, PUZZLE_HINTS
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-conf', default=PUZZLE_CONF)
+    parser.add_argument('-hints', default=PUZZLE_HINTS)
+    parser.add_argument('-count', type=int, default=100, help='Number of seeds to solve')
+    parser.add_argument('-seed', type=int, default=0, help='First seed')
+    parser.add_argument('-max-nodes', dest='max_nodes', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    puzzle = Puzzle(args.conf, args.hints or None)
+    solver = RingSolver(puzzle)
+    solver.solve(args.seed)  # compilation
+    start = time.time()
+    found = set()
+    for seed in range(args.seed, args.seed + args.count):
+        ring = solver.solve(seed, args.max_nodes)
+        if ring is not None:
+            found.add(tuple(ring[0].tolist()))
+    elapsed = time.time() - start
+    print(f"| RING {len(solver.cells)} CELLS | {len(found)} DISTINCT PERFECT FRAMES / {args.count} SEEDS | "
+          f"{args.count / elapsed:.1f} SEEDS/S |")
@@ -1,11 +1,20 @@
-import json
+import argparse
+import glob
 import os
 import numpy as np
-import pandas as pd
 import multiprocessing
+import threading
+from multiprocessing import shared_memory
 from numba import njit
+import numba._helperlib
 import time
-import subprocess
+import queue
+import zipfile
+from core.defs import PuzzleDefinition
+from core.progress_log import ProgressLog
+from core.status import StatusBlock
+from ui.render import BoardRenderer
+from ring import RingSolver
 
 # ==============================
 # Classe couleurs ANSI
@@ -18,16 +27,15 @@ class C:
     BLUE    = "\033[34m"
     CYAN    = "\033[36m"
     GRAY    = "\033[90m"
+    MAGENTA = "\033[35m"
     BOLD    = "\033[1m"
 
 # ==============================
 # Paramètres globaux
 # ==============================
-SIZE = 16
 ROT = 4
-FIX_I, FIX_J = 8, 7
-FIX_PIECE = 138
-FIX_ROT = 0
+PUZZLE_CONF = "data/eternity2/eternity2_256_1.csv"
+PUZZLE_HINTS = "data/eternity2/eternity2_256_hints.csv"
 NUM_CHAINS = 1
 T0 = 20.0
 T_MIN = 0.01
@@ -36,7 +44,33 @@ MAX_STEPS_WITHOUT_IMPROV = 30 * 10000
 BOOST_MAX = 0.55
 BOOST_MIN = 0.15
 BORDER_PENALTY_WEIGHT = 1
-LOG_FILE = "log.json"
+SAVE_MIN_SCORE_GAP = 64                 # sauvegarde des plateaux à au plus cet écart du score parfait
+SCORE_CHECK_INTERVAL = 100000
+STEPS_PER_BATCH = 100000
+EXP_TABLE_SIZE = 64
+EXP_TABLE_REFRESH = 64
+TYPED_MOVES = True
+MOVE_PROBS = (0.02, 0.18, 0.70, 0.10)   # échanges coins / bords / intérieur, rotation intérieure
+PARALLEL_TEMPERING = False              # répliques à températures fixes au lieu de chaînes indépendantes
+PT_T_COLD = 0.3
+PT_T_HOT = 3.0
+PT_EXCHANGE_STEPS = 20000
+PT_TARGET_SWAP_RATE = 0.25
+PT_ADAPT_RATE = 0.05
+PT_RATE_SMOOTHING = 0.05
+LOG_FILE = "log.jsonl"                  # une entrée JSON par ligne, ajoutée en fin de fichier
+LOG_MAX_BYTES = 1 << 20                 # rotation en log.jsonl.1, .2, ... au-delà
+LOG_BACKUPS = 3
+METRICS_INTERVAL = 1.0                  # publication des compteurs de chaque chaîne (s)
+CHECKPOINT_DIR = "checkpoints"
+CHECKPOINT_INTERVAL = 60.0              # secondes entre deux checkpoints d'une chaîne
+WARM_START_FILES = []                   # solutions CSV (motifs glob) de départ, réparties entre les chaînes
+WARM_START_PERTURB = 0                  # mouvements aléatoires appliqués à un plateau de départ
+WARM_START_T0 = 0.55                    # température initiale d'une chaîne démarrée à chaud
+RING_START = False                      # cadre parfait (ring.py) posé avant le recuit de l'intérieur
+RING_FRAME_MOBILITY = 0.0               # facteur des échanges coins / bords sur ce cadre (0 : figé)
+RING_MAX_NODES = 1_000_000              # nœuds par tentative du solveur de cadre
+RING_ATTEMPTS = 20
 
 DIRS = np.array([[-1,0],[0,1],[1,0],[0,-1]], dtype=np.int64)
 OPP = np.array([2,3,0,1], dtype=np.int64)
@@ -44,9 +78,6 @@ OPP = np.array([2,3,0,1], dtype=np.int64)
 # ==============================
 # Chargement et rotations
 # ==============================
-def load_tiles(file_path="data/eternity2/eternity2_256.csv"):
-    return pd.read_csv(file_path, header=None).values.astype(np.int16)
-
 def precompute_rotations(tiles):
     N = len(tiles)
     S = N*ROT
@@ -56,125 +87,582 @@ def precompute_rotations(tiles):
             t_rot[p*ROT+r] = np.roll(tiles[p], -r)
     return t_rot, N, S
 
+# ==============================
+# Plateau aplati et tables de correspondance
+# ==============================
+# Les noyaux du recuit travaillent sur un plateau aplati de (H+2)*(W+2) cases
+# entouré d'un cadre de sentinelles : la case (i,j) est à l'indice
+# (i+1)*(W+2) + j+1 et sa voisine dans la direction d (N, E, S, O) à
+# + offsets[d], sans aucun test de bord. Chaque case contient la pièce
+# tournée s = p*ROT + r, le cadre la pièce fictive N*ROT. Les 4 couleurs
+# d'une pièce tournée sont empaquetées dans un mot de 32 bits (8 bits par
+# côté, gris = 0, le cadre ayant sa propre couleur) et la valeur d'une arête
+# se lit dans match[couleur, couleur en face] : 1 pour deux couleurs égales,
+# border_w pour un côté gris face au cadre, 0 sinon.
+COLOR_BITS = 8
+COLOR_MASK = 0xFF
+
+def pack_rotations(t_rot):
+    colors = np.where(t_rot < 0, 0, t_rot).astype(np.uint32)
+    frame_color = int(colors.max()) + 1
+    if frame_color > COLOR_MASK:
+        raise ValueError(f"{frame_color - 1} colors do not fit in {COLOR_BITS} bits")
+    words = np.zeros(t_rot.shape[0] + 1, dtype=np.uint32)
+    for d in range(4):
+        words[:-1] |= colors[:,d] << (COLOR_BITS*d)
+        words[-1] |= np.uint32(frame_color << (COLOR_BITS*d))
+    return words
+
+def match_table(words, border_w):
+    frame_color = int(words[-1] & COLOR_MASK)
+    match = np.zeros((frame_color+1, frame_color+1), dtype=np.int64)
+    match[np.arange(frame_color), np.arange(frame_color)] = 1
+    match[0,frame_color] = match[frame_color,0] = border_w
+    return match
+
+def neighbour_offsets(width):
+    return np.array([-(width+2), 1, width+2, -1], dtype=np.int64)
+
+# ==============================
+# Table des meilleures rotations
+# ==============================
+# La meilleure rotation d'une pièce ne dépend que de la pièce et des 4
+# couleurs tournées vers elle. Pour une pièce p, chaque couleur voisine est
+# ramenée à une classe color_class[p, couleur] : 0 pour une couleur absente
+# de la pièce (arête toujours nulle), puis une classe par couleur de ses
+# côtés et une pour le cadre. rot_table[p, clé] donne, pour la clé formée des
+# 4 classes (N, E, S, O) en base COLOR_CLASSES, score local*ROT + rotation,
+# la rotation étant la première de score maximal.
+COLOR_CLASSES = 6
+
+def rotation_tables(words, match):
+    n_colors = match.shape[0]
+    n_pieces = (len(words) - 1) // ROT
+    shifts = COLOR_BITS * np.arange(4, dtype=np.uint32)
+    color_class = np.zeros((n_pieces, n_colors), dtype=np.uint8)
+    scores = np.zeros((n_pieces, ROT) + (COLOR_CLASSES,)*4, dtype=np.int64)
+    for p in range(n_pieces):
+        # sides[r, d] : couleur du côté d de la pièce tournée de r
+        sides = (words[p*ROT:(p+1)*ROT, None] >> shifts) & COLOR_MASK
+        reps = np.array(sorted(set(sides[0].tolist())) + [n_colors-1], dtype=np.int64)
+        color_class[p, reps] = np.arange(1, len(reps)+1)
+        # edge[r, d, c] : valeur de l'arête d face à la classe c
+        edge = np.zeros((ROT, 4, COLOR_CLASSES), dtype=np.int64)
+        edge[:, :, 1:len(reps)+1] = match[sides[:, :, None], reps[None, None, :]]
+        scores[p] = (edge[:, 0, :, None, None, None] + edge[:, 1, None, :, None, None]
+                     + edge[:, 2, None, None, :, None] + edge[:, 3, None, None, None, :])
+    scores = scores.reshape(n_pieces, ROT, -1)
+    best_r = scores.argmax(axis=1)
+    packed = np.take_along_axis(scores, best_r[:, None], axis=1)[:, 0]*ROT + best_r
+    dtype = np.uint8 if packed.max() <= np.iinfo(np.uint8).max else np.uint16
+    return color_class, packed.astype(dtype)
+
+class Puzzle:
+    # Instance passée aux noyaux, lue depuis un fichier de définition
+    # (en-tête hauteur,largeur,... puis une pièce par ligne, voir core/defs.py)
+    # et un fichier d'indices optionnel donnant les pièces fixes.
+    def __init__(self, conf=PUZZLE_CONF, hints=PUZZLE_HINTS):
+        puzzle_def = PuzzleDefinition()
+        puzzle_def.load(conf, hints)
+        self.conf = conf
+        self.definition = puzzle_def
+        self.height = puzzle_def.height
+        self.width = puzzle_def.width
+        # couleurs dans l'ordre du fichier, gris (0) noté -1
+        self.tiles = np.array([[c if c else -1 for c in puzzle_def.all[p+1].colors]
+                               for p in range(len(puzzle_def.all))], dtype=np.int16)
+        self.t_rot, self.N, _ = precompute_rotations(self.tiles)
+        self.border_w = BORDER_PENALTY_WEIGHT
+        self.words = pack_rotations(self.t_rot)
+        self.match = match_table(self.words, self.border_w)
+        self.offsets = neighbour_offsets(self.width)
+        self.color_class, self.rot_table = rotation_tables(self.words, self.match)
+        # tables passées telles quelles aux noyaux du recuit
+        self.tables = (self.words, self.match, self.offsets, self.color_class, self.rot_table)
+
+        self.fixed = np.zeros((self.height, self.width), dtype=np.bool_)
+        self.fixed_p = np.zeros((self.height, self.width), dtype=np.int16)
+        self.fixed_r = np.zeros((self.height, self.width), dtype=np.int16)
+        for i, j, piece_id, orientation in puzzle_def.hints:
+            self.fixed[i,j] = True
+            self.fixed_p[i,j] = piece_id - 1
+            self.fixed_r[i,j] = (3 - orientation) % 4 if orientation >= 0 else 0
+
+    def cells(self):
+        return [(i,j) for i in range(self.height) for j in range(self.width) if not self.fixed[i,j]]
+
+    def flat_index(self, i, j):
+        return (i+1)*(self.width+2) + j+1
+
+    def flat_board(self, board_p, board_r):
+        cells = np.empty((self.height+2)*(self.width+2), dtype=np.int16)
+        flatten_board_numba(board_p, board_r, cells, len(self.words)-1)
+        return cells
+
+# ==============================
+# Classes de cases et de pièces
+# ==============================
+CLS_CORNER = 0
+CLS_EDGE = 1
+CLS_INNER = 2
+
+def cell_class(puzzle, i, j):
+    on_i = i==0 or i==puzzle.height-1
+    on_j = j==0 or j==puzzle.width-1
+    if on_i and on_j:
+        return CLS_CORNER
+    if on_i or on_j:
+        return CLS_EDGE
+    return CLS_INNER
+
+def piece_class(t_rot, p):
+    greys = int(np.sum(t_rot[p*ROT]==-1))
+    if greys==2:
+        return CLS_CORNER
+    if greys==1:
+        return CLS_EDGE
+    return CLS_INNER
+
+def build_move_tables(puzzle, typed, frame_mobility=1.0):
+    # Cases échangeables (indices du plateau aplati) regroupées par classe
+    # (une seule classe si typed est faux) et probabilités cumulées de chaque
+    # type de mouvement, la dernière entrée étant la rotation sur place d'une
+    # case intérieure. frame_mobility réduit la part des échanges de coins et
+    # de bords (0 : cadre figé).
+    cells = puzzle.cells()
+    if typed:
+        groups = [[c for c in cells if cell_class(puzzle, *c)==k] for k in (CLS_CORNER, CLS_EDGE, CLS_INNER)]
+        probs = list(MOVE_PROBS)
+        probs[CLS_CORNER] *= frame_mobility
+        probs[CLS_EDGE] *= frame_mobility
+    else:
+        groups = [cells]
+        probs = [1.0, 0.0]
+    for k, group in enumerate(groups):
+        if len(group) < 2:
+            probs[k] = 0.0
+    rot_cells = [c for c in cells if cell_class(puzzle, *c)==CLS_INNER]
+    if not rot_cells:
+        probs[-1] = 0.0
+
+    move_slots = np.array([puzzle.flat_index(*c) for group in groups for c in group], dtype=np.int64)
+    move_bounds = np.cumsum([0]+[len(group) for group in groups]).astype(np.int64)
+    move_cdf = np.cumsum(probs) / np.sum(probs)
+    move_cdf[np.nonzero(probs)[0][-1]:] = 1.0
+    rot_slots = np.array([puzzle.flat_index(*c) for c in rot_cells], dtype=np.int64)
+    return move_slots, move_bounds, move_cdf, rot_slots
+
+def chain_move_tables(puzzle, warm):
+    # Une chaîne partie d'un cadre parfait le garde figé (ou presque)
+    mobility = RING_FRAME_MOBILITY if RING_START and warm is None else 1.0
+    return build_move_tables(puzzle, TYPED_MOVES, mobility)
+
 # ==============================
 # Score compilé
 # ==============================
-@njit
-def score_numba(board_p, board_r, t_rot):
+@njit(cache=True)
+def score_numba(board_p, board_r, t_rot, border_w):
+    # Score complet sur le plateau (H, W), calculé sans les tables du plateau
+    # aplati : sert de référence au score incrémental (check_score)
+    H, W = board_p.shape
     total = 0
-    for i in range(SIZE):
-        for j in range(SIZE):
+    for i in range(H):
+        for j in range(W):
             p = board_p[i,j]
             r = board_r[i,j]
             s = p*ROT+r
             t = t_rot[s]
-            if i==0 and t[0]==-1: total += BORDER_PENALTY_WEIGHT
-            if j==SIZE-1 and t[1]==-1: total += BORDER_PENALTY_WEIGHT
-            if i==SIZE-1 and t[2]==-1: total += BORDER_PENALTY_WEIGHT
-            if j==0 and t[3]==-1: total += BORDER_PENALTY_WEIGHT
-            if i+1<SIZE:
+            if i==0 and t[0]==-1: total += border_w
+            if j==W-1 and t[1]==-1: total += border_w
+            if i==H-1 and t[2]==-1: total += border_w
+            if j==0 and t[3]==-1: total += border_w
+            if i+1<H:
                 p2 = board_p[i+1,j]
                 r2 = board_r[i+1,j]
                 s2 = p2*ROT+r2
                 if t[2]==t_rot[s2][0]: total += 1
-            if j+1<SIZE:
+            if j+1<W:
                 p2 = board_p[i,j+1]
                 r2 = board_r[i,j+1]
                 s2 = p2*ROT+r2
                 if t[1]==t_rot[s2][3]: total += 1
     return total
 
+@njit(cache=True)
+def flatten_board_numba(board_p, board_r, cells, frame):
+    H, W = board_p.shape
+    cells[:] = frame
+    for i in range(H):
+        for j in range(W):
+            cells[(i+1)*(W+2) + j+1] = board_p[i,j]*ROT + board_r[i,j]
+
+@njit(cache=True)
+def unflatten_board_numba(cells, board_p, board_r):
+    H, W = board_p.shape
+    for i in range(H):
+        for j in range(W):
+            s = cells[(i+1)*(W+2) + j+1]
+            board_p[i,j] = s // ROT
+            board_r[i,j] = s % ROT
+
 # ==============================
-# Optimisation locale compilée
+# Score incrémental compilé
 # ==============================
-@njit
-def optimize_local(board_p, board_r, t_rot, positions):
+@njit(cache=True)
+def local_score_numba(cells, words, match, offsets, positions):
+    # Contribution au score des cases de positions (plateau aplati) : arêtes
+    # touchant ces cases, cadre compris, chaque arête n'étant comptée qu'une
+    # fois.
+    total = 0
     for idx in range(positions.shape[0]):
-        i,j = positions[idx]
-        if i==FIX_I and j==FIX_J:
+        k = positions[idx]
+        seen = False
+        for m in range(idx):
+            if positions[m]==k:
+                seen = True
+        if seen:
             continue
-        p = board_p[i,j]
-        best_score = -1
-        best_r = 0
-        for r in range(ROT):
-            board_r[i,j] = r
-            s = p*ROT + r
-            local = 0
-            for d in range(4):
-                di = DIRS[d,0]
-                dj = DIRS[d,1]
-                ni = i + di
-                nj = j + dj
-                if 0<=ni<SIZE and 0<=nj<SIZE:
-                    p2 = board_p[ni,nj]
-                    r2 = board_r[ni,nj]
-                    s2 = p2*ROT+r2
-                    if t_rot[s][d]==t_rot[s2][OPP[d]]:
-                        local +=1
-            t = t_rot[s]
-            if i==0 and t[0]==-1: local += BORDER_PENALTY_WEIGHT
-            if j==SIZE-1 and t[1]==-1: local += BORDER_PENALTY_WEIGHT
-            if i==SIZE-1 and t[2]==-1: local += BORDER_PENALTY_WEIGHT
-            if j==0 and t[3]==-1: local += BORDER_PENALTY_WEIGHT
-            if local>best_score:
-                best_score = local
-                best_r = r
-        board_r[i,j] = best_r
+        w = words[cells[k]]
+        for d in range(4):
+            k2 = k + offsets[d]
+            # arête déjà comptée depuis une case précédente
+            seen = False
+            for m in range(idx):
+                if positions[m]==k2:
+                    seen = True
+            if seen:
+                continue
+            total += match[(w >> (COLOR_BITS*d)) & COLOR_MASK,
+                           (words[cells[k2]] >> (COLOR_BITS*((d+2)%4))) & COLOR_MASK]
+    return total
 
 # ==============================
-# Propose move compilé
+# Optimisation locale compilée
 # ==============================
-@njit
-def propose_move_numba(board_p, board_r):
-    while True:
-        i1,j1 = np.random.randint(0,SIZE), np.random.randint(0,SIZE)
-        i2,j2 = np.random.randint(0,SIZE), np.random.randint(0,SIZE)
-        if (i1,j1)!=(i2,j2) and (i1,j1)!=(FIX_I,FIX_J) and (i2,j2)!=(FIX_I,FIX_J):
+@njit(cache=True)
+def optimize_local(cells, words, offsets, color_class, rot_table, positions):
+    # Meilleure rotation de chaque case de positions, l'une après l'autre,
+    # lue dans rot_table d'après les couleurs de ses voisines. positions ne
+    # contient jamais de case fixe (cases de Puzzle.cells()).
+    for idx in range(positions.shape[0]):
+        k = positions[idx]
+        p = cells[k] // ROT
+        # couleurs des voisines tournées vers la case
+        f0 = (words[cells[k+offsets[0]]] >> (COLOR_BITS*2)) & COLOR_MASK
+        f1 = (words[cells[k+offsets[1]]] >> (COLOR_BITS*3)) & COLOR_MASK
+        f2 = words[cells[k+offsets[2]]] & COLOR_MASK
+        f3 = (words[cells[k+offsets[3]]] >> COLOR_BITS) & COLOR_MASK
+        key = (((np.int64(color_class[p,f0])*COLOR_CLASSES + color_class[p,f1])*COLOR_CLASSES
+                + color_class[p,f2])*COLOR_CLASSES + color_class[p,f3])
+        cells[k] = p*ROT + rot_table[p,key] % ROT
+
+# ==============================
+# Mouvement en place compilé (sans allocation)
+# ==============================
+@njit(cache=True)
+def propose_move_inplace_numba(cells, words, match, offsets, color_class, rot_table,
+                               move_slots, move_bounds, move_cdf, rot_slots, affected, undo):
+    # Tire un type de mouvement selon move_cdf : échange de deux cases d'une
+    # même classe de move_slots (suivi de l'optimisation locale) ou rotation
+    # sur place d'une case de rot_slots. Le mouvement est appliqué directement
+    # sur le plateau aplati ; undo reçoit les anciennes pièces tournées des
+    # cases de affected. Retourne ΔS.
+    n_classes = move_bounds.shape[0] - 1
+    u = np.random.rand()
+    k = 0
+    while u >= move_cdf[k]:
+        k += 1
+    if k == n_classes:
+        # rotation : la case figure deux fois dans affected
+        k1 = rot_slots[np.random.randint(0, rot_slots.shape[0])]
+        k2 = k1
+    else:
+        lo = move_bounds[k]
+        n = move_bounds[k+1] - lo
+        a = np.random.randint(0, n)
+        b = np.random.randint(0, n-1)
+        if b >= a:
+            b += 1
+        k1 = move_slots[lo+a]
+        k2 = move_slots[lo+b]
+    affected[0] = k1
+    affected[1] = k2
+    old_local = local_score_numba(cells, words, match, offsets, affected)
+    undo[0] = cells[k1]
+    undo[1] = cells[k2]
+    if k == n_classes:
+        s = cells[k1]
+        cells[k1] = s - s % ROT + (s % ROT + np.random.randint(1,ROT)) % ROT
+    else:
+        cells[k1], cells[k2] = cells[k2], cells[k1]
+        optimize_local(cells, words, offsets, color_class, rot_table, affected)
+    return local_score_numba(cells, words, match, offsets, affected) - old_local
+
+@njit(cache=True)
+def undo_move_numba(cells, affected, undo):
+    for k in range(affected.shape[0]-1, -1, -1):
+        cells[affected[k]] = undo[k]
+
+# ==============================
+# Noyau de recuit compilé
+# ==============================
+EV_NONE = 0
+EV_IMPROVED = 1
+EV_SOLVED = 2
+
+ST_STEP = 0
+ST_SCORE = 1
+ST_BEST = 2
+ST_NO_IMPROV = 3
+ST_BOOSTS = 4
+ST_ACCEPTS = 5
+N_STATE = 6
+
+@njit(cache=True)
+def seed_numba(seed):
+    # Le générateur de numba est distinct de celui de NumPy côté Python
+    np.random.seed(seed)
+
+@njit(cache=True)
+def fill_exp_table(exp_table, T):
+    # exp_table[k] = exp(-k/T) pour les ΔS entiers négatifs
+    for k in range(exp_table.shape[0]):
+        exp_table[k] = np.exp(-k / T)
+
+@njit(cache=True)
+def anneal_batch_numba(board_p, board_r, best_p, best_r, words, match, offsets, color_class, rot_table,
+                       move_slots, move_bounds, move_cdf, rot_slots,
+                       state, T, n_steps, alpha, t_min, max_no_improv, boost_max, boost_min, max_score,
+                       exp_table_size, exp_table_refresh):
+    # Enchaîne jusqu'à n_steps pas de recuit (proposition, optimisation locale,
+    # acceptation, refroidissement, boost) sans repasser par Python. Rend la
+    # main plus tôt dès que le meilleur score de la chaîne progresse.
+    # state contient step, score courant, meilleur score, pas sans
+    # amélioration, nombre de boosts et de mouvements acceptés ; retourne
+    # (T, événement). Les plateaux sont aplatis le temps du lot.
+    # exp_table_size et exp_table_refresh sont passés en arguments : une
+    # globale lue ici serait figée à la compilation (et dans le cache).
+    H, W = board_p.shape
+    cells = np.empty((H+2)*(W+2), dtype=np.int16)
+    flatten_board_numba(board_p, board_r, cells, words.shape[0]-1)
+    best_cells = cells.copy()
+    improved = False
+    affected = np.zeros(2, dtype=np.int64)
+    undo = np.zeros(2, dtype=np.int16)
+    exp_table = np.empty(exp_table_size, dtype=np.float64)
+    fill_exp_table(exp_table, T)
+
+    step = state[ST_STEP]
+    current_score = state[ST_SCORE]
+    best_score = state[ST_BEST]
+    no_improv = state[ST_NO_IMPROV]
+    boosts = state[ST_BOOSTS]
+    accepts = state[ST_ACCEPTS]
+    event = EV_NONE
+
+    for _ in range(n_steps):
+        dS = propose_move_inplace_numba(cells, words, match, offsets, color_class, rot_table,
+                                        move_slots, move_bounds, move_cdf, rot_slots, affected, undo)
+
+        accept = dS > 0
+        if not accept:
+            if -dS < exp_table_size:
+                accept = np.random.rand() < exp_table[-dS]
+            else:
+                accept = np.random.rand() < np.exp(dS / T)
+
+        if accept:
+            current_score += dS
+            accepts += 1
+            if current_score > best_score:
+                best_cells[:] = cells
+                improved = True
+                best_score = current_score
+                no_improv = 0
+                event = EV_IMPROVED
+        else:
+            undo_move_numba(cells, affected, undo)
+            no_improv += 1
+
+        T = max(T*alpha, t_min)
+        step += 1
+        if step % exp_table_refresh == 0:
+            fill_exp_table(exp_table, T)
+
+        if no_improv > max_no_improv:
+            T = max(boost_max * np.random.rand(), boost_min)
+            no_improv = 0
+            boosts += 1
+            fill_exp_table(exp_table, T)
+
+        if best_score == max_score:
+            event = EV_SOLVED
+        if event != EV_NONE:
             break
-    new_p = board_p.copy()
-    new_r = board_r.copy()
-    new_p[i1,j1], new_p[i2,j2] = new_p[i2,j2], new_p[i1,j1]
-    new_r[i1,j1], new_r[i2,j2] = new_r[i2,j2], new_r[i1,j1]
-    affected = np.array([[i1,j1],[i2,j2]], dtype=np.int64)
-    return new_p, new_r, affected
+
+    unflatten_board_numba(cells, board_p, board_r)
+    if improved:
+        unflatten_board_numba(best_cells, best_p, best_r)
+    state[ST_STEP] = step
+    state[ST_SCORE] = current_score
+    state[ST_BEST] = best_score
+    state[ST_NO_IMPROV] = no_improv
+    state[ST_BOOSTS] = boosts
+    state[ST_ACCEPTS] = accepts
+    return T, event
+
+# ==============================
+# Préchauffage JIT
+# ==============================
+def warmup(puzzle):
+    # Compile (ou recharge depuis le cache disque de numba) tous les noyaux
+    # sur un plateau jetable, avant de lancer les chaînes : les processus
+    # fils héritent des versions compilées.
+    start = time.time()
+    board_p, board_r = initial_board(puzzle)
+    cells = puzzle.flat_board(board_p, board_r)
+    state = np.zeros(N_STATE, dtype=np.int64)
+    move_tables = build_move_tables(puzzle, TYPED_MOVES)
+    affected = np.zeros(2, dtype=np.int64)
+    undo = np.zeros(2, dtype=np.int16)
+    seed_numba(0)
+    score_numba(board_p, board_r, puzzle.t_rot, puzzle.border_w)
+    propose_move_inplace_numba(cells, *puzzle.tables, *move_tables, affected, undo)
+    anneal_batch_numba(board_p, board_r, board_p.copy(), board_r.copy(), *puzzle.tables, *move_tables,
+                       state, T0, 1, ALPHA, T_MIN, MAX_STEPS_WITHOUT_IMPROV, BOOST_MAX, BOOST_MIN, 0,
+                       EXP_TABLE_SIZE, EXP_TABLE_REFRESH)
+    if RING_START:
+        RingSolver(puzzle).solve(0, 1)
+    return time.time() - start
 
 # ==============================
 # Sauvegarde CSV
 # ==============================
-def save_board_csv(board_p, board_r, score):
+def solution_path(score):
+    return f"solutions/partial_solution_{score}.csv"
+
+def image_paths(puzzle, board_p, board_r):
+    # Même nommage que generate.py : score sans le bonus de bord
+    score = score_numba(board_p, board_r, puzzle.t_rot, 0)
+    return (f"img/partial_solution_{score}_with_marks.jpg",
+            f"img/partial_solution_{score}_without_marks.jpg")
+
+def score_wanted(puzzle, score):
+    return score >= max_possible_score(puzzle) - SAVE_MIN_SCORE_GAP
+
+def solution_wanted(puzzle, score):
+    return score_wanted(puzzle, score) and not os.path.exists(solution_path(score))
+
+def images_wanted(puzzle, board_p, board_r, score):
+    # Indépendant du CSV : des images ratées sont refaites au prochain envoi
+    return score_wanted(puzzle, score) and not all(map(os.path.exists, image_paths(puzzle, board_p, board_r)))
+
+def save_board_csv(puzzle, board_p, board_r, score):
     os.makedirs("solutions", exist_ok=True)
-    filename = f"solutions/partial_solution_{score}.csv"
+    filename = solution_path(score)
 
-    if os.path.exists(filename) or score < 480:
+    if not solution_wanted(puzzle, score):
         return
 
+    write_board_csv(filename, board_p, board_r)
+
+def write_board_csv(filename, board_p, board_r, placed=None):
+    # Une ligne i,j,id,orientation par case (seulement les cases de placed
+    # pour un plateau partiel)
     with open(filename, 'w') as f:
-        for i in range(SIZE):
-            for j in range(SIZE):
+        for i in range(board_p.shape[0]):
+            for j in range(board_p.shape[1]):
+                if placed is not None and not placed[i, j]:
+                    continue
                 p = board_p[i, j]
                 r = board_r[i, j]
                 orientation = ((4 - r) % 4 + 3) % 4
                 f.write(f"{i},{j},{p + 1},{orientation}\n")
 
-    cmd = [
-        "python",
-        "generate.py",
-        "-conf", "data/eternity2/eternity2_256_1.csv",
-        "-hints", filename
-    ]
+def save_board_images(puzzle, renderer, board_p, board_r):
+    with_marks, without_marks = image_paths(puzzle, board_p, board_r)
+    ids, dirs = board_p + 1, (3 - board_r) % 4
+    renderer.save(with_marks, ids, dirs, marks=True)
+    renderer.save(without_marks, ids, dirs, marks=False)
+
+def queue_board(puzzle, renders, board_p, board_r, score):
+    # Appelé par les chaînes : copie du plateau envoyée au processus de
+    # rendu, sans attendre ni l'écriture du CSV ni les images
+    if solution_wanted(puzzle, score) or images_wanted(puzzle, board_p, board_r, score):
+        renders.put((score, board_p.copy(), board_r.copy()))
+
+def render_worker(puzzle, renders):
+    # Sauvegarde et rendu des plateaux reçus, meilleur score d'abord. Les
+    # envois arrivés pendant un rendu sont regroupés : seul le dernier
+    # plateau reçu pour chaque score est gardé. None arrête le processus
+    # une fois la file vidée.
+    renderer = BoardRenderer(puzzle.definition)
+    pending = {}
+    stop = False
+    while not stop or pending:
+        items = [] if pending else [renders.get()]
+        while True:
+            try:
+                items.append(renders.get_nowait())
+            except queue.Empty:
+                break
+        for item in items:
+            if item is None:
+                stop = True
+            else:
+                score, board_p, board_r = item
+                pending[score] = (board_p, board_r)
+        if pending:
+            score = max(pending)
+            board_p, board_r = pending.pop(score)
+            # Une erreur (disque plein, PIL...) ne doit pas arrêter le
+            # processus : plus personne ne viderait la file des chaînes
+            try:
+                save_board_csv(puzzle, board_p, board_r, score)
+            except Exception as e:
+                print(f"{C.BOLD}{C.RED}| CSV SAVE FAILED FOR SCORE {score} ({e}) |{C.RESET}")
+            try:
+                if images_wanted(puzzle, board_p, board_r, score):
+                    save_board_images(puzzle, renderer, board_p, board_r)
+            except Exception as e:
+                print(f"{C.BOLD}{C.RED}| RENDER FAILED FOR SCORE {score} ({e}) |{C.RESET}")
 
-    env = os.environ.copy()
-    if os.name != "nt":  # Linux headless / Docker
-        env["SDL_VIDEODRIVER"] = "dummy"
 
-    # NE PAS REDIRIGER LES ERREURS pendant le debug
-    subprocess.run(cmd, check=True, env=env, cwd=os.getcwd())
+# ==============================
+# Chargement CSV (démarrage à chaud)
+# ==============================
+def load_board_csv(puzzle, filename):
+    # Inverse de save_board_csv : lignes i,j,id (1..N),orientation
+    board_p = np.full((puzzle.height, puzzle.width), -1, dtype=np.int16)
+    board_r = np.zeros((puzzle.height, puzzle.width), dtype=np.int16)
+    with open(filename, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            i, j, piece_id, orientation = (int(x) for x in line.strip().split(","))
+            board_p[i, j] = piece_id - 1
+            board_r[i, j] = (3 - orientation) % 4
+    if (board_p < 0).any() or len(np.unique(board_p)) != board_p.size:
+        raise ValueError(f"{filename}: incomplete board or duplicated pieces")
+    for i, j in zip(*np.nonzero(puzzle.fixed)):
+        if board_p[i,j] != puzzle.fixed_p[i,j]:
+            raise ValueError(f"{filename}: piece {puzzle.fixed_p[i,j] + 1} is not at ({i},{j})")
+    board_r[puzzle.fixed] = puzzle.fixed_r[puzzle.fixed]
+    return board_p, board_r
 
+def perturb_board(puzzle, board_p, board_r, move_tables, n_moves):
+    # Mouvements du générateur courant, tous acceptés
+    cells = puzzle.flat_board(board_p, board_r)
+    affected = np.zeros(2, dtype=np.int64)
+    undo = np.zeros(2, dtype=np.int16)
+    for _ in range(n_moves):
+        propose_move_inplace_numba(cells, *puzzle.tables, *move_tables, affected, undo)
+    unflatten_board_numba(cells, board_p, board_r)
 
 # ==============================
 # Json log
 # ==============================
-def log(seed, current_score, step, start_time, global_best):
+def log(seed, current_score, step, start_time, best_score, best_seed):
 
     elapsed = time.time() - start_time
     steps_per_sec = step / elapsed if elapsed > 0 else 0
@@ -182,126 +670,489 @@ def log(seed, current_score, step, start_time, global_best):
     entry = {
         "seed": seed,
         "current_score": current_score,
-        "best_score": global_best['score'],
-        "best_seed": global_best['seed'],
+        "best_score": best_score,
+        "best_seed": best_seed,
         "step": step,
         "steps_per_sec": steps_per_sec,
         "elapsed_time": elapsed
     }
 
-    # Crée le fichier si nécessaire et ajoute l'entrée
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r+", encoding="utf-8") as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError:
-                data = []
-            data.append(entry)
-            f.seek(0)
-            json.dump(data, f, indent=2)
-            f.truncate()
-    else:
-        with open(LOG_FILE, "w", encoding="utf-8") as f:
-            json.dump([entry], f, indent=2)
+    # Ajout d'une ligne, sans relire l'historique
+    ProgressLog(LOG_FILE, LOG_MAX_BYTES, LOG_BACKUPS).append(entry)
 
 
+# ==============================
+# Checkpoints
+# ==============================
+CHECKPOINT_VERSION = 1
+# champs lus à la reprise : un checkpoint auquel il en manque est ignoré
+CHECKPOINT_KEYS = ('version', 'mode', 'board_p', 'board_r', 'best_p', 'best_r', 'state', 'T', 'elapsed',
+                   'rng_numba_pos', 'rng_numba_key', 'rng_numpy_pos', 'rng_numpy_key')
+
+def checkpoint_path(seed):
+    return os.path.join(CHECKPOINT_DIR, f"chain_{seed}.npz")
+
+def get_rng_state():
+    # numba n'expose pas d'API publique pour l'état de son générateur
+    pos, key = numba._helperlib.rnd_get_state(numba._helperlib.rnd_get_np_state_ptr())
+    _, np_key, np_pos, _, _ = np.random.get_state()
+    return {
+        'rng_numba_pos': np.int64(pos),
+        'rng_numba_key': np.array(key, dtype=np.uint32),
+        'rng_numpy_pos': np.int64(np_pos),
+        'rng_numpy_key': np.asarray(np_key, dtype=np.uint32),
+    }
+
+def set_rng_state(ckpt):
+    numba._helperlib.rnd_set_state(numba._helperlib.rnd_get_np_state_ptr(),
+                                   (int(ckpt['rng_numba_pos']), [int(k) for k in ckpt['rng_numba_key']]))
+    np.random.set_state(('MT19937', ckpt['rng_numpy_key'], int(ckpt['rng_numpy_pos'])))
+
+def save_checkpoint(puzzle, seed, mode, board_p, board_r, best_p, best_r, state, T, elapsed, **extra):
+    # Écriture dans un fichier temporaire puis renommage atomique : un arrêt
+    # brutal laisse toujours le checkpoint précédent intact.
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = checkpoint_path(seed)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, version=CHECKPOINT_VERSION, mode=mode, tiles=puzzle.tiles, board_p=board_p, board_r=board_r,
+                 best_p=best_p, best_r=best_r, state=state, T=T, elapsed=elapsed,
+                 **get_rng_state(), **extra)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load_checkpoint(puzzle, seed, mode):
+    path = checkpoint_path(seed)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            ckpt = {k: data[k] for k in data.files}
+        missing = [k for k in CHECKPOINT_KEYS if k not in ckpt]
+        if missing:
+            raise KeyError(f"missing {', '.join(missing)}")
+    except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile) as e:
+        print(f"{C.BOLD}{C.YELLOW}| SEED {seed:<2} | CHECKPOINT IGNORED ({e}) |{C.RESET}")
+        return None
+    if int(ckpt['version']) != CHECKPOINT_VERSION or str(ckpt['mode']) != mode \
+            or ckpt['board_p'].shape != (puzzle.height, puzzle.width) \
+            or ('tiles' in ckpt and not np.array_equal(ckpt['tiles'], puzzle.tiles)):
+        print(f"{C.BOLD}{C.YELLOW}| SEED {seed:<2} | CHECKPOINT IGNORED (incompatible) |{C.RESET}")
+        return None
+    return ckpt
+
 # ==============================
 # Simulated Annealing
 # ==============================
-def simulated_annealing_csv(seed, t_rot, N, global_best, global_lock):
-    np.random.seed(seed)
-    board_p = np.zeros((SIZE,SIZE), dtype=np.int16)
-    board_r = np.zeros((SIZE,SIZE), dtype=np.int16)
-    board_p[FIX_I,FIX_J] = FIX_PIECE
-    board_r[FIX_I,FIX_J] = FIX_ROT
+def initial_board(puzzle):
+    t_rot = puzzle.t_rot
+    board_p = puzzle.fixed_p.copy()
+    board_r = puzzle.fixed_r.copy()
 
-    available = [p for p in range(N) if p!=FIX_PIECE]
+    placed = set(puzzle.fixed_p[puzzle.fixed].tolist())
+    available = [p for p in range(puzzle.N) if p not in placed]
+    if TYPED_MOVES:
+        # chaque pièce part dans une case de sa classe : les échanges typés
+        # ne mélangent jamais coins, bords et intérieur
+        pools = {k: [p for p in available if piece_class(t_rot, p)==k] for k in (CLS_CORNER, CLS_EDGE, CLS_INNER)}
     idx = 0
-    for i in range(SIZE):
-        for j in range(SIZE):
-            if (i,j)!=(FIX_I,FIX_J):
-                board_p[i,j] = available[idx % len(available)]
-                board_r[i,j] = np.random.randint(0,ROT)
-                idx += 1
-
-    current_score = score_numba(board_p, board_r, t_rot)
-    best_p, best_r = board_p.copy(), board_r.copy()
-    best_score = current_score
-    T = T0
-    steps_without_improv = 0
-    max_possible_score = (SIZE*(SIZE-1)*2)+(4*SIZE-4)*BORDER_PENALTY_WEIGHT
-    step = 0
-    start_time = time.time()
+    for i, j in puzzle.cells():
+        if TYPED_MOVES:
+            board_p[i,j] = pools[cell_class(puzzle, i, j)].pop(0)
+        else:
+            board_p[i,j] = available[idx % len(available)]
+        board_r[i,j] = np.random.randint(0,ROT)
+        idx += 1
 
-    while True:
-        new_p, new_r, affected = propose_move_numba(board_p, board_r)
-        optimize_local(new_p, new_r, t_rot, affected)
-        new_score = score_numba(new_p, new_r, t_rot)
-        dS = new_score - current_score
+    if TYPED_MOVES:
+        border = np.array([puzzle.flat_index(*c) for c in puzzle.cells() if cell_class(puzzle, *c)!=CLS_INNER],
+                          dtype=np.int64)
+        cells = puzzle.flat_board(board_p, board_r)
+        optimize_local(cells, puzzle.words, puzzle.offsets, puzzle.color_class, puzzle.rot_table, border)
+        unflatten_board_numba(cells, board_p, board_r)
+    return board_p, board_r
 
-        if dS > 0 or np.random.rand() < np.exp(dS / T):
-            board_p, board_r = new_p, new_r
-            current_score = new_score
+def ring_board(puzzle):
+    # Plateau neuf dont l'anneau de bord est un cadre parfait de ring.py,
+    # l'intérieur étant rempli comme dans initial_board
+    solver = RingSolver(puzzle)
+    for _ in range(RING_ATTEMPTS):
+        ring = solver.solve(np.random.randint(2**31), RING_MAX_NODES)
+        if ring is not None:
+            break
+    else:
+        raise RuntimeError(f"no perfect frame found in {RING_ATTEMPTS} attempts")
+    board_p = puzzle.fixed_p.copy()
+    board_r = puzzle.fixed_r.copy()
+    solver.place(board_p, board_r, ring)
 
-            if current_score > best_score:
-                best_p, best_r = board_p.copy(), board_r.copy()
-                best_score = current_score
-                steps_without_improv = 0
-                save_board_csv(best_p, best_r, current_score)
-
-                # Mise à jour du meilleur global
-                with global_lock:
-                    if current_score > global_best['score']:
-                        global_best['score'] = current_score
-                        global_best['seed'] = seed
-                        global_best['time'] = time.time() - start_time
-                        elapsed = global_best['time']
-                        steps_per_sec = step / elapsed
-                        console_log = (
-                            f"{C.BOLD}{C.GREEN}| SEED {seed:<2} | SCORE {current_score:<5} | "
-                            f"BEST SEED {seed:<2} | STEP {step:<7} | {steps_per_sec:>7.2f} steps/sec | "
-                            f"TIME {elapsed:>7.1f}s |{C.RESET}"
-                        )
-                        log(seed, current_score, step, start_time, global_best)
-                        # print(console_log)
+    placed = set(board_p[puzzle.fixed].tolist()) | set(ring[0].tolist())
+    inner = [p for p in range(puzzle.N) if p not in placed and piece_class(puzzle.t_rot, p)==CLS_INNER]
+    for i, j in puzzle.cells():
+        if cell_class(puzzle, i, j)==CLS_INNER:
+            board_p[i,j] = inner.pop(0)
+            board_r[i,j] = np.random.randint(0,ROT)
+    return board_p, board_r
 
+def max_possible_score(puzzle):
+    # arêtes intérieures plus un bonus par côté gris tourné vers l'extérieur
+    H, W = puzzle.height, puzzle.width
+    return H*(W-1) + W*(H-1) + 2*(H+W)*puzzle.border_w
+
+def record_best(puzzle, seed, best_p, best_r, best_score, step, start_time, status, status_lock, renders):
+    queue_board(puzzle, renders, best_p, best_r, best_score)
+    status.update_chain(seed, last_improvement=time.time())
+
+    # Mise à jour du meilleur global
+    elapsed = time.time() - start_time
+    if status.try_update_best(status_lock, best_score, seed, step, elapsed, best_p, best_r):
+        steps_per_sec = step / elapsed
+        console_log = (
+            f"{C.BOLD}{C.GREEN}| SEED {seed:<2} | SCORE {best_score:<5} | "
+            f"BEST SEED {seed:<2} | STEP {step:<7} | {steps_per_sec:>7.2f} steps/sec | "
+            f"TIME {elapsed:>7.1f}s |{C.RESET}"
+        )
+        with status_lock:  # la rotation ne doit pas se faire à deux
+            log(seed, best_score, step, start_time, best_score, seed)
+        # print(console_log)
+
+class ChainMeter:
+    # Compteurs d'une chaîne publiés dans le bloc d'état au plus toutes les
+    # METRICS_INTERVAL secondes ; débit et taux d'acceptation sont mesurés
+    # sur l'intervalle écoulé depuis la publication précédente.
+    def __init__(self, status, seed, state):
+        self.status = status
+        self.seed = seed
+        self.last_time = time.time()
+        self.last_steps = int(state[ST_STEP])
+        self.last_accepts = int(state[ST_ACCEPTS])
+
+    def publish(self, state, T, force=False):
+        now = time.time()
+        dt = now - self.last_time
+        if dt < METRICS_INTERVAL and not force:
+            return
+        steps, accepts = int(state[ST_STEP]), int(state[ST_ACCEPTS])
+        fields = dict(steps=steps, score=state[ST_SCORE], best=state[ST_BEST], temperature=T,
+                      boosts=state[ST_BOOSTS], accepted=accepts)
+        if steps > self.last_steps and dt > 0:
+            fields['steps_per_sec'] = (steps - self.last_steps) / dt
+            fields['acceptance'] = (accepts - self.last_accepts) / (steps - self.last_steps)
+        self.status.update_chain(self.seed, **fields)
+        self.last_time, self.last_steps, self.last_accepts = now, steps, accepts
+
+def check_score(puzzle, seed, board_p, board_r, state):
+    # Contrôle du score incrémental par un recalcul complet
+    full_score = score_numba(board_p, board_r, puzzle.t_rot, puzzle.border_w)
+    if full_score != state[ST_SCORE]:
+        print(f"{C.BOLD}{C.RED}| SEED {seed:<2} | SCORE DRIFT {state[ST_SCORE]} != {full_score} |{C.RESET}")
+        state[ST_SCORE] = full_score
+
+def start_chain(puzzle, seed, mode, T, warm, status, status_lock, resume=True):
+    # Reprend la chaîne depuis son checkpoint s'il existe (et si resume),
+    # sinon part de la solution warm = (fichier, nb de perturbations) ou d'un
+    # plateau neuf. Retourne plateaux, meilleur plateau, state, T et le temps
+    # déjà écoulé.
+    ckpt = load_checkpoint(puzzle, seed, mode) if resume else None
+    if ckpt is None:
+        np.random.seed(seed)
+        seed_numba(seed)
+        if warm is not None:
+            board_p, board_r = load_board_csv(puzzle, warm[0])
+            perturb_board(puzzle, board_p, board_r, build_move_tables(puzzle, TYPED_MOVES), warm[1])
+            print(f"{C.BOLD}{C.CYAN}| SEED {seed:<2} | WARM START FROM {warm[0]} |{C.RESET}")
+        elif RING_START:
+            board_p, board_r = ring_board(puzzle)
+            print(f"{C.BOLD}{C.CYAN}| SEED {seed:<2} | PERFECT FRAME, ANNEALING THE INTERIOR |{C.RESET}")
         else:
-            steps_without_improv += 1
+            board_p, board_r = initial_board(puzzle)
+        current_score = score_numba(board_p, board_r, puzzle.t_rot, puzzle.border_w)
+        state = np.zeros(N_STATE, dtype=np.int64)
+        state[ST_SCORE] = current_score
+        state[ST_BEST] = current_score
+        if warm is not None:
+            status.try_update_best(status_lock, current_score, seed, 0, 0.0, board_p, board_r)
+        return board_p, board_r, board_p.copy(), board_r.copy(), state, T, 0.0
 
-        T = max(T*ALPHA, T_MIN)
-        step += 1
+    set_rng_state(ckpt)
+    state = np.zeros(N_STATE, dtype=np.int64)
+    state[:len(ckpt['state'])] = ckpt['state']  # compteurs ajoutés depuis : 0
+    best_p, best_r = ckpt['best_p'].astype(np.int16), ckpt['best_r'].astype(np.int16)
+    elapsed = float(ckpt['elapsed'])
+    status.try_update_best(status_lock, int(state[ST_BEST]), seed, int(state[ST_STEP]), elapsed, best_p, best_r)
+    print(f"{C.BOLD}{C.CYAN}| SEED {seed:<2} | RESUMED AT STEP {state[ST_STEP]} | BEST {state[ST_BEST]} |{C.RESET}")
+    return (ckpt['board_p'].astype(np.int16), ckpt['board_r'].astype(np.int16), best_p, best_r,
+            state, float(ckpt['T']), elapsed)
 
-        if steps_without_improv > MAX_STEPS_WITHOUT_IMPROV:
-            rand_factor = np.random.rand() # uniforme entre 0 et 1
-            T = max(BOOST_MAX * rand_factor, BOOST_MIN)
-            steps_without_improv = 0
-            # print(f"{C.BOLD}{C.YELLOW}| SEED {seed:<2} | TEMPERATURE BOOSTED TO {T:.4f} |{C.RESET}")
-            save_board_csv(best_p, best_r, seed)
+def simulated_annealing_csv(puzzle, seed, status_name, status_lock, renders, warm):
+    status = StatusBlock.attach(status_name, forked=True)
+    T_start = T0 if warm is None else WARM_START_T0
+    board_p, board_r, best_p, best_r, state, T, elapsed = start_chain(puzzle, seed, "sa", T_start, warm,
+                                                                      status, status_lock)
+    tables = puzzle.tables
+    move_tables = chain_move_tables(puzzle, warm)
+    max_score = max_possible_score(puzzle)
+    last_check = int(state[ST_STEP])
+    start_time = time.time() - elapsed
+    last_checkpoint = time.time()
+    meter = ChainMeter(status, seed, state)
+    meter.publish(state, T, force=True)
 
-        if best_score == max_possible_score:
+    while True:
+        T, event = anneal_batch_numba(board_p, board_r, best_p, best_r, *tables, *move_tables,
+                                      state, T, STEPS_PER_BATCH, ALPHA, T_MIN, MAX_STEPS_WITHOUT_IMPROV,
+                                      BOOST_MAX, BOOST_MIN, max_score, EXP_TABLE_SIZE, EXP_TABLE_REFRESH)
+        step = int(state[ST_STEP])
+        best_score = int(state[ST_BEST])
+        meter.publish(state, T, force=event != EV_NONE)
+
+        if event != EV_NONE:
+            record_best(puzzle, seed, best_p, best_r, best_score, step, start_time, status, status_lock,
+                        renders)
+
+        if step - last_check >= SCORE_CHECK_INTERVAL:
+            last_check = step
+            check_score(puzzle, seed, board_p, board_r, state)
+
+        if time.time() - last_checkpoint >= CHECKPOINT_INTERVAL:
+            last_checkpoint = time.time()
+            save_checkpoint(puzzle, seed, "sa", board_p, board_r, best_p, best_r, state, T, time.time() - start_time)
+
+        if event == EV_SOLVED:
             print(f"{C.BOLD}{C.GREEN}| SEED {seed:<2} | SOLUTION FOUND! SCORE={best_score} |{C.RESET}")
-            save_board_csv(best_p, best_r, seed)
             break
+    status.close()
+
+# ==============================
+# Parallel tempering (échange de répliques)
+# ==============================
+def pt_block_size(puzzle, n_replicas):
+    cells = n_replicas*puzzle.height*puzzle.width
+    return 2*cells*2 + n_replicas*(8+8) + (n_replicas-1)*(8+8+8) + 8
+
+def pt_arrays(puzzle, buf, n_replicas):
+    # Vues NumPy sur le bloc partagé : plateaux et score de chaque réplique,
+    # échelle de températures, statistiques d'échange par paire voisine et
+    # décision de checkpoint du tour, prise par la réplique 0.
+    shape = (n_replicas, puzzle.height, puzzle.width)
+    off = 0
+    def take(dtype, shape):
+        nonlocal off
+        arr = np.ndarray(shape, dtype=dtype, buffer=buf, offset=off)
+        off += arr.nbytes
+        return arr
+    return {
+        'temps': take(np.float64, (n_replicas,)),
+        'scores': take(np.int64, (n_replicas,)),
+        'attempts': take(np.int64, (n_replicas-1,)),
+        'accepts': take(np.int64, (n_replicas-1,)),
+        'rates': take(np.float64, (n_replicas-1,)),
+        'checkpoint': take(np.int64, (1,)),
+        'boards_p': take(np.int16, shape),
+        'boards_r': take(np.int16, shape),
+    }
+
+def pt_exchange(pt, round_idx):
+    # Tentatives de Metropolis entre répliques voisines (paires paires puis
+    # impaires en alternance) : les plateaux sont échangés avec la probabilité
+    # min(1, exp((S_k+1 - S_k) * (1/T_k - 1/T_k+1))).
+    temps, scores = pt['temps'], pt['scores']
+    for k in range(round_idx % 2, len(temps)-1, 2):
+        x = (scores[k+1] - scores[k]) * (1.0/temps[k] - 1.0/temps[k+1])
+        accepted = x >= 0 or np.random.rand() < np.exp(x)
+        pt['attempts'][k] += 1
+        if accepted:
+            pt['accepts'][k] += 1
+            for name in ('boards_p', 'boards_r'):
+                tmp = pt[name][k].copy()
+                pt[name][k] = pt[name][k+1]
+                pt[name][k+1] = tmp
+            scores[k], scores[k+1] = scores[k+1], scores[k]
+        rate = pt['rates'][k]
+        pt['rates'][k] = (1-PT_RATE_SMOOTHING)*rate + PT_RATE_SMOOTHING*float(accepted)
+
+def pt_adapt_ladder(pt):
+    # Écarts log-température élargis si les échanges d'une paire réussissent
+    # plus souvent que PT_TARGET_SWAP_RATE, resserrés sinon, puis remis à
+    # l'échelle : les extrémités restent PT_T_COLD et PT_T_HOT, seules les
+    # températures intermédiaires se déplacent.
+    temps = pt['temps']
+    if temps.shape[0] < 3:
+        return
+    gaps = np.diff(np.log(temps))
+    gaps *= np.exp(PT_ADAPT_RATE * (pt['rates'] - PT_TARGET_SWAP_RATE))
+    gaps *= np.log(PT_T_HOT / PT_T_COLD) / np.sum(gaps)
+    temps[0] = PT_T_COLD
+    temps[1:-1] = PT_T_COLD * np.exp(np.cumsum(gaps[:-1]))
+    temps[-1] = PT_T_HOT
+
+def pt_resume_round(puzzle):
+    # Tour d'échange commun aux checkpoints de toutes les répliques, None pour
+    # repartir de zéro : les échanges déplacent les plateaux d'une réplique à
+    # l'autre, un jeu de checkpoints pris à des tours différents pourrait en
+    # dupliquer ou en perdre un.
+    ckpts = [load_checkpoint(puzzle, rank, "pt") for rank in range(NUM_CHAINS)]
+    if all(ckpt is None for ckpt in ckpts):
+        return None
+    rounds = {int(ckpt['round']) if ckpt is not None and 'round' in ckpt else -1 for ckpt in ckpts}
+    if len(rounds) != 1 or -1 in rounds:
+        print(f"{C.BOLD}{C.YELLOW}| PT CHECKPOINTS FROM DIFFERENT ROUNDS IGNORED |{C.RESET}")
+        return None
+    return rounds.pop()
+
+def replica_exchange_csv(puzzle, rank, status_name, status_lock, renders, warm, shm_name, barrier, start_round):
+    status = StatusBlock.attach(status_name, forked=True)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    pt = pt_arrays(puzzle, shm.buf, NUM_CHAINS)
+    board_p, board_r, best_p, best_r, state, T, elapsed = start_chain(puzzle, rank, "pt", 0.0, warm,
+                                                                      status, status_lock,
+                                                                      resume=start_round is not None)
+    tables = puzzle.tables
+    move_tables = chain_move_tables(puzzle, warm)
+    max_score = max_possible_score(puzzle)
+    no_boost = np.iinfo(np.int64).max
+    last_check = int(state[ST_STEP])
+    round_idx = start_round or 0
+    start_time = time.time() - elapsed
+    last_checkpoint = time.time()
+    meter = ChainMeter(status, rank, state)
+    meter.publish(state, pt['temps'][rank], force=True)
+
+    try:
+        while True:
+            # Recuit à température fixe : pas de refroidissement ni de boost
+            T = float(pt['temps'][rank])
+            target = state[ST_STEP] + PT_EXCHANGE_STEPS
+            event = EV_NONE
+            while state[ST_STEP] < target and event != EV_SOLVED:
+                _, event = anneal_batch_numba(board_p, board_r, best_p, best_r, *tables,
+                                              *move_tables,
+                                              state, T, target - state[ST_STEP], 1.0, T, no_boost,
+                                              T, T, max_score, EXP_TABLE_SIZE, EXP_TABLE_REFRESH)
+                meter.publish(state, T, force=event != EV_NONE)
+                if event != EV_NONE:
+                    record_best(puzzle, rank, best_p, best_r, int(state[ST_BEST]), int(state[ST_STEP]),
+                                start_time, status, status_lock, renders)
+            step = int(state[ST_STEP])
+            if step - last_check >= SCORE_CHECK_INTERVAL:
+                last_check = step
+                check_score(puzzle, rank, board_p, board_r, state)
+            if event == EV_SOLVED:
+                print(f"{C.BOLD}{C.GREEN}| SEED {rank:<2} | SOLUTION FOUND! SCORE={state[ST_BEST]} |{C.RESET}")
+                barrier.abort()
+                break
+
+            pt['boards_p'][rank] = board_p
+            pt['boards_r'][rank] = board_r
+            pt['scores'][rank] = state[ST_SCORE]
+            barrier.wait()
+            if rank == 0:
+                pt_exchange(pt, round_idx)
+                if PT_ADAPT_RATE > 0:
+                    pt_adapt_ladder(pt)
+                # toutes les répliques sauvegardent au même tour
+                pt['checkpoint'][0] = time.time() - last_checkpoint >= CHECKPOINT_INTERVAL
+                if pt['checkpoint'][0]:
+                    last_checkpoint = time.time()
+            barrier.wait()
+            board_p[:] = pt['boards_p'][rank]
+            board_r[:] = pt['boards_r'][rank]
+            state[ST_SCORE] = pt['scores'][rank]
+            round_idx += 1
+
+            if pt['checkpoint'][0]:
+                # la réplique 0 sauvegarde aussi l'échelle de températures
+                ladder = {k: pt[k] for k in ('temps', 'rates', 'attempts', 'accepts')} if rank == 0 else {}
+                save_checkpoint(puzzle, rank, "pt", board_p, board_r, best_p, best_r, state, T,
+                                time.time() - start_time, round=round_idx, **ladder)
+    except threading.BrokenBarrierError:
+        pass
+    finally:
+        del pt
+        shm.close()
+        status.close()
 
 # ==============================
 # Main parallèle
 # ==============================
 if __name__ == "__main__":
-    tiles = load_tiles()
-    t_rot, N, S = precompute_rotations(tiles)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-conf', default=PUZZLE_CONF, help='Puzzle definition file')
+    parser.add_argument('-hints', default=PUZZLE_HINTS,
+                        help='Fixed pieces (i,j,id,orientation per line), empty for none')
+    parser.add_argument('-warm', nargs='*', default=WARM_START_FILES,
+                        help='Solution CSV files or glob patterns to start the chains from')
+    parser.add_argument('-perturb', type=int, default=WARM_START_PERTURB,
+                        help='Random moves applied to each warm-start board')
+    parser.add_argument('-warmup', action='store_true',
+                        help='Only compile the kernels into the on-disk cache and exit')
+    parser.add_argument('-ring', action='store_true', default=RING_START,
+                        help='Start the chains from a perfect frame built by ring.py and anneal the interior')
+    args = parser.parse_args()
+    if args.ring and not TYPED_MOVES:
+        parser.error("-ring needs TYPED_MOVES")
+    RING_START = args.ring
+
+    warm_files = sorted({f for pattern in args.warm for f in glob.glob(pattern)})
+    if args.warm and not warm_files:
+        parser.error(f"no solution file matches {args.warm}")
+
+    puzzle = Puzzle(args.conf, args.hints or None)
+    print(f"{C.BOLD}{C.GRAY}| PUZZLE {puzzle.height}x{puzzle.width} | {puzzle.N} PIECES | "
+          f"MAX SCORE {max_possible_score(puzzle)} |{C.RESET}")
+    jit_time = warmup(puzzle)
+    print(f"{C.BOLD}{C.GRAY}| JIT READY IN {jit_time:.2f}s |{C.RESET}")
+    if args.warmup:
+        raise SystemExit(0)
 
-    manager = multiprocessing.Manager()
-    global_best = manager.dict({'score': -1, 'seed': -1, 'time': 0})
-    global_lock = multiprocessing.Lock()
+    # Bloc d'état partagé : meilleur global et compteurs par chaîne,
+    # lisible sans IPC par le tableau de bord
+    try:
+        status = StatusBlock.create(puzzle.height, puzzle.width, NUM_CHAINS)
+    except RuntimeError as e:
+        raise SystemExit(f"{C.BOLD}{C.RED}| {e} |{C.RESET}")
+    status_lock = multiprocessing.Lock()
+
+    # Rendu des solutions hors des chaînes
+    renders = multiprocessing.Queue()
+    renderer = multiprocessing.Process(target=render_worker, args=(puzzle, renders))
+    renderer.start()
+
+    shm = None
+    if PARALLEL_TEMPERING and NUM_CHAINS > 1:
+        # Échelle géométrique initiale, adaptée ensuite par la réplique 0
+        shm = shared_memory.SharedMemory(create=True, size=pt_block_size(puzzle, NUM_CHAINS))
+        pt = pt_arrays(puzzle, shm.buf, NUM_CHAINS)
+        pt['temps'][:] = np.geomspace(PT_T_COLD, PT_T_HOT, NUM_CHAINS)
+        pt['rates'][:] = PT_TARGET_SWAP_RATE
+        start_round = pt_resume_round(puzzle)
+        ckpt = load_checkpoint(puzzle, 0, "pt") if start_round is not None else None
+        if ckpt is not None and 'temps' in ckpt and ckpt['temps'].shape == pt['temps'].shape:
+            for k in ('temps', 'rates', 'attempts', 'accepts'):
+                pt[k][:] = ckpt[k]
+        del pt
+        barrier = multiprocessing.Barrier(NUM_CHAINS)
+        target, extra = replica_exchange_csv, (shm.name, barrier, start_round)
+    else:
+        target, extra = simulated_annealing_csv, ()
 
     processes = []
     for seed in range(NUM_CHAINS):
-        p = multiprocessing.Process(target=simulated_annealing_csv,
-                                    args=(seed, t_rot, N, global_best, global_lock))
+        warm = (warm_files[seed % len(warm_files)], args.perturb) if warm_files else None
+        p = multiprocessing.Process(target=target,
+                                    args=(puzzle, seed, status.shm.name, status_lock, renders, warm) + extra)
         p.start()
         processes.append(p)
     for p in processes:
         p.join()
+    renders.put(None)
+    renderer.join()
 
+    if shm is not None:
+        shm.close()
+        shm.unlink()
 
-    print(f"{C.BOLD}{C.MAGENTA}| FINAL BEST SCORE {global_best['score']} by SEED {global_best['seed']} |{C.RESET}")
+    best = status.read_best()
+    status.close()
+    print(f"{C.BOLD}{C.MAGENTA}| FINAL BEST SCORE {best['score']} by SEED {best['seed']} |{C.RESET}")
@@ -0,0 +1,103 @@
+import hashlib
+import math
+import os
+
+import pygame
+
+from ui.patterns import GRAY, LINE, pattern_paths, load_patterns
+
+# Piece sprites for every piece and rotation, built once from the pattern
+# images and stored on disk as a single PNG. The file name is a hash of
+# everything the sprites depend on (piece colors, sprite width, pattern
+# images, layout version), so a changed definition or pattern simply builds
+# a new atlas next to the old one.
+#
+# Only the interactive viewer (ui/ui.py) uses these sprites; solution images
+# are rendered without pygame by ui/render.py.
+#
+# Layout: pieces in sorted id order, `per_row` pieces per row, each piece
+# taking 4 consecutive cells of piece_width x piece_width (rotations 0..3).
+
+ATLAS_DIR = os.path.join("cache", "atlas")
+ATLAS_VERSION = 1
+
+def atlas_key(puzzle_def, piece_width):
+    h = hashlib.sha256()
+    h.update(f"v{ATLAS_VERSION};w{piece_width};".encode())
+    for id in sorted(puzzle_def.all):
+        h.update(f"{id}:{puzzle_def.all[id].colors};".encode())
+    for path in pattern_paths():
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def layout(n_pieces):
+    per_row = math.ceil(math.sqrt(n_pieces))
+    rows = math.ceil(n_pieces / per_row)
+    return per_row, rows
+
+
+def piece_sprites(piece, color_images, piece_width):
+    color_dim = color_images[1].get_height() if 1 in color_images else 50
+    high_res = pygame.Surface((2 * color_dim, 2 * color_dim), pygame.SRCALPHA)
+    high_res.fill(GRAY)
+
+    for idx, angle, pos in zip([2, 3, 1, 0], [0, 270, 90, 180],
+                               [(0, 0), (color_dim, 0), (0, color_dim), (color_dim, color_dim)]):
+        color_id = piece.colors[idx]
+        if color_id != 0 and color_id in color_images:
+            high_res.blit(pygame.transform.rotate(color_images[color_id], angle), pos)
+
+    sprites = []
+    for dir in range(4):
+        high_res2 = pygame.transform.rotate(high_res, 45 - dir * 90)
+        h = high_res2.get_height() // 4
+        low_res = pygame.Surface((2 * h, 2 * h), pygame.SRCALPHA)
+        low_res.blit(high_res2, (0, 0), (h, h, 2 * h, 2 * h))
+        low_res = pygame.transform.scale(low_res, (piece_width, piece_width))
+        pygame.draw.line(low_res, LINE, (0, 0), (piece_width, piece_width), 2)
+        pygame.draw.line(low_res, LINE, (piece_width, 0), (0, piece_width), 2)
+        sprites.append(low_res)
+    return sprites
+
+
+def build_atlas(puzzle_def, piece_width):
+    color_images = load_patterns(lambda path: pygame.image.load(path).convert_alpha())
+    ids = sorted(puzzle_def.all)
+    per_row, rows = layout(len(ids))
+    atlas = pygame.Surface((per_row * 4 * piece_width, rows * piece_width), pygame.SRCALPHA)
+    atlas.fill((0, 0, 0, 0))
+    for k, id in enumerate(ids):
+        x, y = (k % per_row) * 4 * piece_width, (k // per_row) * piece_width
+        for dir, sprite in enumerate(piece_sprites(puzzle_def.all[id], color_images, piece_width)):
+            atlas.blit(sprite, (x + dir * piece_width, y))
+    return atlas
+
+
+def load_atlas(puzzle_def, piece_width):
+    # {id: [sprite for rotation 0..3]}, sprites being views into the atlas;
+    # needs a display mode to be set (convert_alpha)
+    path = os.path.join(ATLAS_DIR, f"atlas_{atlas_key(puzzle_def, piece_width)}.png")
+    atlas = None
+    if os.path.exists(path):
+        try:
+            atlas = pygame.image.load(path).convert_alpha()
+        except pygame.error:
+            atlas = None
+    if atlas is None:
+        atlas = build_atlas(puzzle_def, piece_width)
+        os.makedirs(ATLAS_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.png"
+        pygame.image.save(atlas, tmp)
+        os.replace(tmp, path)
+
+    ids = sorted(puzzle_def.all)
+    per_row, _ = layout(len(ids))
+    sprites = {}
+    for k, id in enumerate(ids):
+        x, y = (k % per_row) * 4 * piece_width, (k // per_row) * piece_width
+        sprites[id] = [atlas.subsurface((x + dir * piece_width, y, piece_width, piece_width))
+                       for dir in range(4)]
+    return sprites
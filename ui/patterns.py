@@ -0,0 +1,26 @@
+import os
+import sys
+
+# Edge pattern images and drawing colors shared by the pygame sprites
+# (ui/atlas.py) and the NumPy renderer (ui/render.py).
+
+PATTERN_DIR = os.path.join("data", "patterns")
+PATTERN_COUNT = 22
+
+GRAY = (53, 87, 100)
+LINE = (50, 50, 50)
+
+
+def pattern_paths():
+    return [os.path.join(PATTERN_DIR, f"pattern{i}.png") for i in range(1, PATTERN_COUNT + 1)]
+
+
+def load_patterns(load):
+    # {color id: load(path)} for every pattern image present on disk
+    color_images = {}
+    for i, path in enumerate(pattern_paths(), 1):
+        if not os.path.exists(path):
+            print(f"[WARNING] Image manquante: {path}", file=sys.stderr)
+            continue
+        color_images[i] = load(path)
+    return color_images
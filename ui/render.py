@@ -0,0 +1,162 @@
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from ui.patterns import PATTERN_COUNT, GRAY, LINE, load_patterns
+
+# Board renderer without pygame. Every (piece, rotation) tile is rasterised
+# once with NumPy, with and without its id mark, so that rendering a board
+# is a single gather of tiles followed by a reshape:
+#
+#   tiles[ids*4 + dirs]  (H, W, w, w, 3) -> (H*w, W*w, 3)
+#
+# Tile index id*4 + dir, id 0 being the empty cell. dir follows PieceRef:
+# the color at side pos (E, S, W, N) is piece.colors[(pos - dir) % 4].
+# The geometry matches the pygame sprites of ui/atlas.py: each side shows
+# its pattern in the triangle between the two diagonals.
+
+EMPTY_GRAY = (192, 192, 192)
+WHITE = (255, 255, 255)
+MARK_BOX = (25, 20)
+MARK_ALPHA = 100 / 255
+
+
+def quadrants(color_images, dim):
+    # every pattern rotated by k quarter turns counterclockwise and
+    # composited on GRAY, at index color*4 + k (color 0 = plain GRAY)
+    out = np.empty(((PATTERN_COUNT + 1) * 4, dim, dim, 3), dtype=np.uint8)
+    out[...] = GRAY
+    for color_id, rgba in color_images.items():
+        alpha = rgba[..., 3:].astype(np.float32) / 255
+        flat = rgba[..., :3] * alpha + np.array(GRAY, dtype=np.float32) * (1 - alpha)
+        for k in range(4):
+            out[color_id * 4 + k] = np.rint(np.rot90(flat, k))
+    return out
+
+
+# quadrants of the pygame high_res square (top-left, top-right, bottom-left,
+# bottom-right): side index in piece.colors and counterclockwise quarter turns
+QUADRANT_SIDES = (2, 3, 1, 0)
+QUADRANT_TURNS = (0, 3, 1, 2)
+
+
+def tile_sample_grid(w, dim, dir):
+    # high_res (row, col) sampled by each output pixel: the square of side
+    # 2*dim is turned by 45 - 90*dir degrees and its central diamond kept
+    theta = np.radians(45 - 90 * dir)
+    half = dim * np.sqrt(2) / 2   # half side of the kept square
+    u = ((np.arange(w) + 0.5) / w - 0.5) * 2 * half
+    dx, dy = np.meshgrid(u, u)
+    ox = dx * np.cos(theta) - dy * np.sin(theta)
+    oy = dx * np.sin(theta) + dy * np.cos(theta)
+    col = np.clip(np.floor(dim + ox), 0, 2 * dim - 1).astype(np.intp)
+    row = np.clip(np.floor(dim + oy), 0, 2 * dim - 1).astype(np.intp)
+    return row, col
+
+
+def line_mask(w):
+    # both diagonals and the cell border, 2 px wide once tiles are adjacent
+    yy, xx = np.mgrid[0:w, 0:w]
+    mask = (np.abs(xx - yy) <= 0.5) | (np.abs(xx + yy - (w - 1)) <= 0.5)
+    mask[[0, -1], :] = True
+    mask[:, [0, -1]] = True
+    return mask
+
+
+def digit_atlas(font=None):
+    # white-on-black coverage of '0'..'9', shape (10, height, width)
+    font = font or ImageFont.load_default()
+    boxes = [font.getbbox(str(d)) for d in range(10)]
+    top = min(b[1] for b in boxes)
+    height = max(b[3] for b in boxes) - top
+    width = max(b[2] - b[0] for b in boxes)
+    glyphs = np.zeros((10, height, width), dtype=np.float32)
+    for d, box in enumerate(boxes):
+        img = Image.new("L", (width, height), 0)
+        ImageDraw.Draw(img).text(((width - (box[2] - box[0])) // 2 - box[0], -top), str(d), fill=255, font=font)
+        glyphs[d] = np.asarray(img, dtype=np.float32) / 255
+    return glyphs
+
+
+def stamp_mark(tile, number, glyphs):
+    # dark translucent box centered in the tile, number in white on top
+    w = tile.shape[0]
+    bw, bh = MARK_BOX
+    x0, y0 = (w - bw) // 2, (w - bh) // 2
+    box = tile[y0:y0 + bh, x0:x0 + bw].astype(np.float32)
+    box = box * (1 - MARK_ALPHA) + np.array(LINE, dtype=np.float32) * MARK_ALPHA
+
+    digits = [int(c) for c in str(number)]
+    _, gh, gw = glyphs.shape
+    label = np.concatenate([glyphs[d] for d in digits], axis=1)[..., None]
+    lx, ly = (bw - label.shape[1]) // 2, (bh - gh) // 2
+    region = box[max(ly, 0):ly + gh, max(lx, 0):lx + label.shape[1]]
+    label = label[max(-ly, 0):max(-ly, 0) + region.shape[0], max(-lx, 0):max(-lx, 0) + region.shape[1]]
+    region[...] = region * (1 - label) + np.array(WHITE, dtype=np.float32) * label
+    tile[y0:y0 + bh, x0:x0 + bw] = np.rint(box)
+
+
+class BoardRenderer:
+
+    def __init__(self, puzzle_def, piece_width=None):
+        self.puzzle_def = puzzle_def
+        self.height = puzzle_def.height
+        self.width = puzzle_def.width
+        if piece_width is None:
+            # same sizing rule as the pygame UIs
+            piece_width = ((800 // max(self.width, self.height)) // 4) * 4
+        self.piece_width = piece_width
+        self.tiles, self.marked_tiles = self.build_tiles(puzzle_def)
+
+    def build_tiles(self, puzzle_def):
+        w = self.piece_width
+        color_images = load_patterns(lambda path: np.asarray(Image.open(path).convert("RGBA")))
+        dim = color_images[1].shape[0] if 1 in color_images else 50
+        quads = quadrants(color_images, dim)
+        glyphs = digit_atlas()
+
+        # quadrant image used by each piece for each high_res quadrant
+        n = max(puzzle_def.all) + 1
+        piece_quads = np.zeros((n, 4), dtype=np.intp)
+        for id, piece in puzzle_def.all.items():
+            piece_quads[id] = [piece.colors[side] * 4 + k for side, k in zip(QUADRANT_SIDES, QUADRANT_TURNS)]
+
+        tiles = np.empty((n, 4, w, w, 3), dtype=np.uint8)
+        for dir in range(4):
+            row, col = tile_sample_grid(w, dim, dir)
+            quadrant = (row >= dim) * 2 + (col >= dim)
+            tiles[:, dir] = quads[piece_quads[:, quadrant], row % dim, col % dim]
+        tiles[:, :, line_mask(w)] = LINE
+        tiles[0] = EMPTY_GRAY
+        tiles = tiles.reshape(n * 4, w, w, 3)
+
+        marked = tiles.copy()
+        for id in puzzle_def.all:
+            for dir in range(4):
+                stamp_mark(marked[id * 4 + dir], id, glyphs)
+        return tiles, marked
+
+    def render(self, ids, dirs, marks=False):
+        # ids, dirs: (height, width) piece ids (0 = empty) and orientations
+        w = self.piece_width
+        tiles = self.marked_tiles if marks else self.tiles
+        cells = tiles[np.asarray(ids) * 4 + np.asarray(dirs) % 4]
+        return cells.transpose(0, 2, 1, 3, 4).reshape(self.height * w, self.width * w, 3)
+
+    def save(self, filename, ids, dirs, marks=False, quality=90):
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        Image.fromarray(self.render(ids, dirs, marks)).save(filename, quality=quality)
+
+
+def board_arrays(board):
+    # ids and orientations of a core.board.Board, for BoardRenderer.render
+    ids = np.zeros((board.puzzle_def.height, board.puzzle_def.width), dtype=np.intp)
+    dirs = np.zeros_like(ids)
+    for i in range(board.puzzle_def.height):
+        for j in range(board.puzzle_def.width):
+            piece = board.board[i][j]
+            if piece:
+                ids[i, j] = piece.piece_def.id
+                dirs[i, j] = piece.dir
+    return ids, dirs
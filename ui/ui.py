@@ -1,4 +1,9 @@
-import pygame
+try:
+    import pygame
+except ImportError:
+    # pygame is not in requirements.txt: only the interactive viewer needs it
+    raise ImportError("the interactive viewer (play.py) needs pygame: pip install pygame") from None
+from ui.atlas import load_atlas
 
 GRAY = (53, 87, 100)#(192, 192, 192)
 EMPTY_GRAY = (192, 192, 192)#(120, 120, 120)
@@ -32,52 +37,8 @@ class BoardUi:
                                                 self.piece_width * self.board.puzzle_def.height))
         self.DISPLAY.fill(WHITE)
 
-        # load color images
-        color_images = {}
-        for i in range(1, 22 + 1):
-            color_images[i] = pygame.image.load(r'data\patterns\pattern%i.png' % i)
-
-        # construct individual piece images
-        color_dim = color_images[1].get_height()
-        for id, piece in self.board.puzzle_def.all.items():
-            self.piece_img[id] = []
-            high_res = pygame.Surface((2 * color_dim, 2 * color_dim))
-            high_res.fill(GRAY)
-            color_id = piece.colors[2]
-            if color_id != 0:
-                high_res.blit(pygame.transform.rotate(
-                    color_images[color_id],
-                    0),
-                    (0, 0))
-            color_id = piece.colors[3]
-            if color_id != 0:
-                high_res.blit(pygame.transform.rotate(
-                    color_images[color_id],
-                    270),
-                    (color_dim, 0))
-            color_id = piece.colors[1]
-            if color_id != 0:
-                high_res.blit(pygame.transform.rotate(
-                    color_images[color_id],
-                    90),
-                    (0, color_dim))
-            color_id = piece.colors[0]
-            if color_id != 0:
-                high_res.blit(pygame.transform.rotate(
-                    color_images[color_id],
-                    180),
-                    (color_dim, color_dim))
-
-            for dir in range(4):
-                high_res2 = pygame.transform.rotate(high_res, 45 - dir * 90)
-
-                h = high_res2.get_height()/4
-                low_res = pygame.Surface((2 * h, 2 * h))
-                low_res.blit(high_res2, (0, 0), (h, h, 2 * h, 2 * h))
-                low_res = pygame.transform.scale(low_res, (self.piece_width, self.piece_width))
-                pygame.draw.lines(low_res, (50, 50, 50), True, [(0,0),(self.piece_width, self.piece_width)], 2)
-                pygame.draw.lines(low_res, (50, 50, 50), True, [(self.piece_width, 0), (0, self.piece_width)], 2)
-                self.piece_img[id].append(low_res)
+        # piece sprites, from the on-disk atlas cache
+        self.piece_img = load_atlas(self.board.puzzle_def, self.piece_width)
 
         # empty field
         self.empty_img = pygame.Surface((self.piece_width, self.piece_width))